@@ -0,0 +1,228 @@
+"""
+Admission Control
+
+ASGI middleware that sheds load instead of letting requests pile up behind
+a saturated backend until their clients have given up:
+
+- per-client token buckets (ADMISSION_RATE requests/s, bursts of
+  ADMISSION_BURST); over the limit is a 429 with Retry-After.
+- a concurrency limit (ADMISSION_MAX_CONCURRENCY requests running); the
+  rest wait in a bounded priority queue (ADMISSION_QUEUE_SIZE).
+- a queue deadline: a request that waited ADMISSION_QUEUE_TIMEOUT seconds
+  without a slot gets a 503 with Retry-After instead of running late. When
+  the queue is full a new request displaces the lowest priority waiter, or
+  is rejected at once if there is none below it.
+
+Cheap reads (single anime, episode pages, typeahead) are admitted ahead of
+lists, which go ahead of search, exports and bulk writes. Limits apply per
+worker process. Rate limiting is off unless ADMISSION_RATE is set, because
+the client identity (the peer address, or X-Forwarded-For when
+ADMISSION_TRUST_FORWARDED=1) depends on the deployment.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import metrics
+from serialization import dumps
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 256))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 1024))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2.0))
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", 0))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", 2 * ADMISSION_RATE))
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED") == "1"
+_MAX_CLIENTS = 100_000
+
+# Never shed: monitoring must keep working while overloaded
+EXEMPT_PATHS = {"/", "/metrics", "/test"}
+
+HIGH, NORMAL, LOW = 0, 1, 2
+
+_CHEAP_READ = re.compile(r"^/api/(anime/(autocomplete|trending|most-watched|batch|[^/]+|[^/]+/episodes)|episodes/batch)$")
+_EXPENSIVE = re.compile(r"^/api/(export|diagnostics/.*|anime/bulk|anime/[^/]+/episodes/bulk)$")
+
+def classify(method: str, path: str, query_string: bytes) -> int:
+    """Admission priority of a request: HIGH for cheap reads, LOW for search, exports and bulk writes"""
+    if _EXPENSIVE.match(path):
+        return LOW
+    if method in ("GET", "HEAD"):
+        if path == "/api/anime":
+            # text search ranks and fetches; plain lists are one indexed query
+            return LOW if re.search(rb"(^|&)q=[^&]", query_string) else NORMAL
+        if path != "/api/anime/facets" and _CHEAP_READ.match(path):
+            return HIGH
+    return NORMAL
+
+class Shed(Exception):
+    """Raised by AdmissionController.acquire when a request is not admitted"""
+
+class AdmissionController:
+    """Concurrency slots with a bounded priority wait queue, plus per-client token buckets.
+
+    Runs on one event loop, so no locking.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        rate: float = ADMISSION_RATE,
+        burst: float = ADMISSION_BURST,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.in_flight = 0
+        self.waiting = 0
+        # waiting futures per priority in arrival order; a waiter that stops
+        # waiting (admitted, timed out, cancelled, displaced) leaves its queue
+        self._queues: List["OrderedDict[asyncio.Future, None]"] = [OrderedDict() for _ in (HIGH, NORMAL, LOW)]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    def check_rate(self, client: str, now: Optional[float] = None) -> float:
+        """Take a token from the client's bucket; 0 if allowed, else seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > _MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        self.rate_limited += 1
+        return (1.0 - bucket[0]) / self.rate
+
+    async def acquire(self, priority: int = NORMAL):
+        """Wait for a concurrency slot; raises Shed when the queue is full or the deadline passes"""
+        if self.in_flight < self.max_concurrency and not self.waiting:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.waiting >= self.queue_size:
+            self._displace(priority)
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority]
+        queue[future] = None
+        self.waiting += 1
+        metrics.ADMISSION_QUEUED.inc()
+        wait = metrics.ADMISSION_WAIT.labels()
+        started = time.perf_counter()
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            raise Shed(f"Server busy: no capacity within {self.queue_timeout:g}s")
+        except asyncio.CancelledError:
+            # the client went away; a slot handed over meanwhile goes to the next waiter
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+        finally:
+            queue.pop(future, None)
+            self.waiting -= 1
+            metrics.ADMISSION_QUEUED.dec()
+            wait.observe(time.perf_counter() - started)
+        self.admitted += 1
+
+    def _displace(self, priority: int):
+        """Make room in a full queue by rejecting the newest lowest priority waiter below priority"""
+        self.shed += 1
+        for level in range(LOW, priority, -1):
+            if self._queues[level]:
+                future, _ = self._queues[level].popitem(last=True)
+                future.set_exception(Shed("Server busy: displaced by higher priority requests"))
+                return
+        raise Shed("Server busy: admission queue is full")
+
+    def release(self):
+        """Free a slot; the best waiter, if any, takes it over"""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for queue in self._queues:
+            while queue and self.in_flight < self.max_concurrency:
+                future, _ = queue.popitem(last=False)
+                if not future.done():
+                    self.in_flight += 1
+                    future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+        }
+
+admission = AdmissionController()
+
+def client_key(scope) -> str:
+    if ADMISSION_TRUST_FORWARDED:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.split(b",")[0].strip().decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else ""
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to HTTP requests"""
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        controller = self.controller
+        retry_after = controller.check_rate(client_key(scope))
+        if retry_after:
+            await _reject(send, 429, "Rate limit exceeded", retry_after)
+            return
+        try:
+            await controller.acquire(classify(scope["method"], scope["path"], scope.get("query_string", b"")))
+        except Shed as e:
+            await _reject(send, 503, str(e), controller.queue_timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
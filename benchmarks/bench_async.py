@@ -0,0 +1,85 @@
+"""
+Async vs sync data layer benchmark
+
+Compares concurrent request throughput of the blocking pymongo helpers
+(sync handlers served from the Starlette threadpool) against the motor
+based async helpers (handlers running on the event loop).
+
+Requires a reachable MongoDB (DATABASE_URL / DATABASE_NAME).
+
+Usage:
+    python benchmarks/bench_async.py --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from database import db, get_documents, get_documents_async
+
+bench_app = FastAPI()
+
+@bench_app.get("/sync/anime")
+def list_sync():
+    return [str(d["_id"]) for d in get_documents("anime", limit=50)]
+
+@bench_app.get("/async/anime")
+async def list_async():
+    return [str(d["_id"]) for d in await get_documents_async("anime", limit=50)]
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[idx]
+
+async def run(path: str, total: int, concurrency: int):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(path)
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "requests": total,
+        "concurrency": concurrency,
+        "rps": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    if db is None:
+        sys.exit("DATABASE_URL and DATABASE_NAME must point at a MongoDB instance")
+
+    # motor binds to the first event loop it sees, so run everything on one loop
+    async def run_all():
+        return [await run(path, args.requests, args.concurrency) for path in ("/sync/anime", "/async/anime")]
+
+    for res in asyncio.run(run_all()):
+        print(f"{res['path']:<14} {res['rps']:>9.1f} req/s  p50 {res['p50_ms']:7.2f} ms  p99 {res['p99_ms']:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
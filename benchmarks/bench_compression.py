@@ -0,0 +1,92 @@
+"""
+Response compression benchmark
+
+Body size and per-request CPU for catalog list responses:
+
+  uncached identity: build + orjson encode on every request (the path before compression)
+  uncached gzip/br:  the same plus compressing on every request
+  cached:            body_cache lookup of the body encoded once per catalog version
+
+then the same comparison end to end through the ASGI app (demo catalog),
+with and without Accept-Encoding.
+
+Usage:
+    python benchmarks/bench_compression.py --size 10000 --limit 50 200 --repeat 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load import seed_demo
+
+def per_call_us(fn, repeat: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+def micro(limit: int, repeat: int):
+    from catalog import demo_catalog
+    from compression import ENCODERS, body_cache
+    from pagination import page_items
+    from serialization import dumps
+
+    def build():
+        items, next_cursor = page_items(demo_catalog.page_anime(limit + 1), limit, "title")
+        return {"items": items, "next_cursor": next_cursor}
+
+    raw = dumps(build())
+    print(f"\n/api/anime?limit={limit}")
+    print(f"  {'variant':<20} {'bytes':>8} {'ratio':>7} {'us/request':>11}")
+    print(f"  {'uncached identity':<20} {len(raw):>8} {1:>7.2f} {per_call_us(lambda: dumps(build()), repeat):>11.1f}")
+    for coding, encode in ENCODERS.items():
+        body = encode(raw)
+        cost = per_call_us(lambda: encode(dumps(build())), max(repeat // 10, 10))
+        print(f"  {'uncached ' + coding:<20} {len(body):>8} {len(body) / len(raw):>7.2f} {cost:>11.1f}")
+        body_cache.set(("bench", "etag", coding), (coding, body))
+    for coding in ENCODERS:
+        cost = per_call_us(lambda: body_cache.get(("bench", "etag", coding)), repeat)
+        print(f"  {'cached ' + coding:<20} {'':>8} {'':>7} {cost:>11.1f}")
+
+async def end_to_end(limit: int, repeat: int):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"\nASGI GET /api/anime?limit={limit}")
+        for accept in ["identity", "gzip", "br"]:
+            headers = {"accept-encoding": accept}
+            r = await client.get("/api/anime", params={"limit": limit}, headers=headers)
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                await client.get("/api/anime", params={"limit": limit}, headers=headers)
+            us = (time.perf_counter() - t0) / repeat * 1e6
+            print(f"  accept {accept:<9} {int(r.headers['content-length']):>8} bytes  {us:8.1f} us/request")
+
+async def run_all(args):
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        for limit in args.limit:
+            micro(limit, args.repeat)
+            await end_to_end(limit, args.repeat // 4)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10_000, help="catalog size")
+    parser.add_argument("--limit", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed_demo(args.size)
+    asyncio.run(run_all(args))
+
+if __name__ == "__main__":
+    main()
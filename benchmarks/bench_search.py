@@ -0,0 +1,94 @@
+"""
+Search benchmark: inverted index vs unanchored regex scan
+
+Generates synthetic catalogs and times the same queries against the
+SearchIndex and against the previous case-insensitive $regex title scan.
+With DATABASE_URL/DATABASE_NAME set the regex path runs on MongoDB (in a
+scratch "bench_anime" collection); otherwise it is emulated in-process with
+a compiled regex over every title, which is what the collection scan does.
+
+Usage:
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db
+from search import SearchIndex
+
+SYLLABLES = "ka ri to na mi shi ro yu ki ha ru sa zo ne ga mo ta ku re n".split()
+TAGS = ["action", "drama", "fantasy", "romance", "sci-fi", "comedy", "horror", "sports", "mystery", "slice of life"]
+QUERIES = ["dragon", "demon hunter", "goddes", "shadow blade academy", "crimson knight", "zzz"]
+
+def make_vocabulary(size: int, rng: random.Random):
+    """Pseudo words plus the query words, drawn with a Zipf-like skew like real titles"""
+    words = {"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)}
+    words = sorted(words) + "dragon demon hunter goddess shadow blade academy crimson knight".split()
+    rng.shuffle(words)
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+def make_catalog(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    words, weights = make_vocabulary(20_000, rng)
+    for i in range(size):
+        title = " ".join(w.title() for w in rng.choices(words, weights, k=rng.randint(2, 4)))
+        yield f"bench-{i}", {
+            "title": f"{title} {i}",
+            "description": " ".join(rng.choices(words, weights, k=12)),
+            "tags": rng.sample(TAGS, 2),
+        }
+
+def time_queries(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        for q in QUERIES:
+            t0 = time.perf_counter()
+            fn(q)
+            samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(0.99 * (len(samples) - 1))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'titles':>9}  {'regex mean':>11} {'regex p99':>10}  {'index mean':>11} {'index p99':>10}  backend")
+    for size in args.sizes:
+        docs = list(make_catalog(size))
+        index = SearchIndex()
+        index.add_many(docs)
+
+        if db is not None:
+            coll = db["bench_anime"]
+            coll.drop()
+            for start in range(0, size, 10_000):
+                coll.insert_many([dict(d) for _, d in docs[start:start + 10_000]], ordered=False)
+            regex = lambda q: list(coll.find({"title": {"$regex": q, "$options": "i"}}).sort("title").limit(50))
+            backend = "mongodb"
+        else:
+            titles = [d["title"] for _, d in docs]
+            def regex(q):
+                pattern = re.compile(q, re.IGNORECASE)
+                return sorted(t for t in titles if pattern.search(t))[:50]
+            backend = "emulated"
+
+        r_mean, r_p99 = time_queries(regex, args.repeat)
+        i_mean, i_p99 = time_queries(lambda q: index.search(q, limit=50), args.repeat)
+        print(f"{size:>9}  {r_mean:>9.2f}ms {r_p99:>8.2f}ms  {i_mean:>9.3f}ms {i_p99:>8.3f}ms  {backend}")
+
+        if db is not None:
+            db["bench_anime"].drop()
+
+if __name__ == "__main__":
+    main()
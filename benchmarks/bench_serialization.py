@@ -0,0 +1,85 @@
+"""
+Serialization micro-benchmark
+
+Per-item cost of turning a 10k-item list of Mongo documents into a JSON
+response body:
+
+  legacy: serialize_doc -> response_model validation -> jsonable_encoder -> json.dumps
+          (what FastAPI did for a returned list with response_model=List[AnimeOut])
+  fast:   projected documents -> to_out -> orjson bytes
+
+Usage:
+    python benchmarks/bench_serialization.py --items 10000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from main import ANIME_DEFAULTS, ANIME_FIELDS, AnimeOut, serialize_doc
+from serialization import dumps, to_out
+
+def make_docs(count: int, projected: bool):
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(count):
+        doc = {
+            "_id": ObjectId(),
+            "title": f"Title {i}",
+            "description": "A cultivator seeks immortality through perseverance and heart.",
+            "cover_url": f"https://images.example.com/{i}.jpg",
+            "tags": ["fantasy", "adventure"],
+            "year": 2000 + i % 25,
+            "external_url": "https://hianime.cv",
+        }
+        if not projected:
+            doc["created_at"] = now
+            doc["updated_at"] = now
+        docs.append(doc)
+    return docs
+
+def legacy(docs, adapter):
+    items = [serialize_doc(d) for d in docs]
+    validated = adapter.validate_python(items)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+def fast(docs):
+    return dumps([to_out(d, ANIME_FIELDS, ANIME_DEFAULTS) for d in docs])
+
+def best_of(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[AnimeOut])
+    full_docs = make_docs(args.items, projected=False)
+    projected_docs = make_docs(args.items, projected=True)
+
+    t_legacy = best_of(lambda: legacy(full_docs, adapter), args.repeat)
+    t_fast = best_of(lambda: fast(projected_docs), args.repeat)
+    per_item = lambda t: t / args.items * 1e6
+    print(f"legacy: {t_legacy * 1000:8.2f} ms total  {per_item(t_legacy):6.2f} us/item")
+    print(f"fast:   {t_fast * 1000:8.2f} ms total  {per_item(t_fast):6.2f} us/item")
+    print(f"speedup: {t_legacy / t_fast:.1f}x")
+
+if __name__ == "__main__":
+    main()
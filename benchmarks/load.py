@@ -0,0 +1,307 @@
+"""
+Endpoint load-test suite
+
+Drives every route in main.py with concurrent clients through an
+in-process ASGI client (httpx.ASGITransport), against the demo fallback
+a local mongod and/or an mmap'ed catalog snapshot (snapshot.py), for a range
+of catalog sizes. Reports throughput
+and p50/p95/p99 latency per route, writes the results as JSON and can
+compare them with a stored baseline, flagging regressions.
+
+Each (backend, size) combination runs in a fresh subprocess because the
+backend is chosen when database.py is imported. Mongo runs use a scratch
+database (--mongo-db, dropped before seeding), never the configured one.
+Snapshots are read-only, so their create_* routes only measure the 405.
+
+Usage:
+    python benchmarks/load.py --backends demo --sizes 100 10000
+    python benchmarks/load.py --backends demo mongo --mongo-url mongodb://localhost:27017 \\
+        --sizes 100 1000 100000 1000000 --out results.json --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "dragon epoch goddess hunter demon eternal brother academy shadow blade spirit kingdom "
+    "titan hero journey moon star ninja samurai sword magic school legend chronicle quest "
+    "phantom reborn slime villain princess knight dungeon tower mecha galaxy crimson silver"
+).split()
+TAGS = ["action", "drama", "fantasy", "romance", "sci-fi", "comedy", "horror", "sports", "mystery"]
+EPISODES_PER_ANIME = 24
+# Only the first anime get episodes so 1M-title catalogs stay tractable
+ANIME_WITH_EPISODES = 1000
+
+ROUTES = ["list", "list_page2", "search", "get", "episodes", "detail", "batch", "create_anime", "create_episode"]
+
+# ----------------------------------------------------------------------------- worker
+
+def make_catalog(size: int, seed: int = 42):
+    rng = random.Random(seed)
+    anime = []
+    for i in range(size):
+        anime.append({
+            "title": f"{' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))} {i}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(12)),
+            "cover_url": f"https://images.example.com/{i}.jpg",
+            "tags": rng.sample(TAGS, 2),
+            "year": 1990 + i % 35,
+            "external_url": "https://hianime.cv",
+        })
+    return anime
+
+def make_episodes(anime_id: str, title: str):
+    return [{
+        "anime_id": anime_id,
+        "number": n,
+        "title": f"{title} - Episode {n}",
+        "stream_url": f"https://stream.example.com/{anime_id}/{n}.mp4",
+        "duration": 24,
+    } for n in range(1, EPISODES_PER_ANIME + 1)]
+
+def seed_demo(size: int) -> List[str]:
+    from bson import ObjectId
+    from catalog import demo_catalog
+    from main import _anime_out, _episode_out
+
+    anime, episodes = [], []
+    for i, doc in enumerate(make_catalog(size)):
+        _id = str(ObjectId())
+        anime.append(_anime_out({**doc, "_id": _id}))
+        if i < ANIME_WITH_EPISODES:
+            episodes += [_episode_out({**ep, "_id": f"{_id}-{ep['number']}"}) for ep in make_episodes(_id, doc["title"])]
+    demo_catalog.load(anime, episodes)
+    return [a["id"] for a in anime]
+
+def seed_snapshot(size: int) -> List[str]:
+    from bson import ObjectId
+    from main import _anime_out, _episode_out
+    from snapshot import write_snapshot
+
+    anime = [_anime_out({**doc, "_id": str(ObjectId())}) for doc in make_catalog(size)]
+    episodes = (
+        _episode_out({**ep, "_id": f"{a['id']}-{ep['number']}"})
+        for a in anime[:ANIME_WITH_EPISODES] for ep in make_episodes(a["id"], a["title"])
+    )
+    write_snapshot(os.environ["CATALOG_SNAPSHOT"], anime, episodes)
+    return [a["id"] for a in anime]
+
+def seed_mongo(size: int) -> List[str]:
+    from database import db
+
+    db["anime"].drop()
+    db["episode"].drop()
+    ids = []
+    catalog = make_catalog(size)
+    for start in range(0, size, 10_000):
+        chunk = catalog[start:start + 10_000]
+        result = db["anime"].insert_many(chunk, ordered=False)
+        ids += [str(i) for i in result.inserted_ids]
+    for doc, _id in zip(catalog[:ANIME_WITH_EPISODES], ids):
+        db["episode"].insert_many(make_episodes(_id, doc["title"]), ordered=False)
+    return ids
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def build_request(route: str, rng: random.Random, ids: List[str], with_episodes: List[str], state: Dict):
+    """(method, path, params, json body) for one request of a route"""
+    if route == "list":
+        return "GET", "/api/anime", {"limit": 50}, None
+    if route == "list_page2":
+        return "GET", "/api/anime", {"limit": 50, "cursor": state["page2_cursor"]}, None
+    if route == "search":
+        return "GET", "/api/anime", {"q": f"{rng.choice(WORDS)} {rng.choice(WORDS)}", "limit": 20}, None
+    if route == "get":
+        return "GET", f"/api/anime/{rng.choice(ids)}", None, None
+    if route == "episodes":
+        return "GET", f"/api/anime/{rng.choice(with_episodes)}/episodes", {"limit": 50}, None
+    if route == "detail":
+        return "GET", f"/api/anime/{rng.choice(with_episodes)}/detail", {"ep_from": 1, "ep_to": 12}, None
+    if route == "batch":
+        return "GET", "/api/anime/batch", {"ids": ",".join(rng.sample(ids, min(20, len(ids))))}, None
+    if route == "create_anime":
+        return "POST", "/api/anime", None, {"title": f"Load Test {rng.random()}", "tags": ["bench"]}
+    if route == "create_episode":
+        state["episode_number"] += 1
+        anime_id = rng.choice(with_episodes)
+        body = {"anime_id": anime_id, "number": state["episode_number"], "title": "bench", "stream_url": "https://x"}
+        return "POST", f"/api/anime/{anime_id}/episodes", None, body
+    raise ValueError(route)
+
+async def run_route(client, route: str, total: int, concurrency: int, ids, with_episodes, state) -> dict:
+    rng = random.Random(route)
+    latencies: List[float] = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(build_request(route, rng, ids, with_episodes, state))
+
+    async def client_loop():
+        nonlocal errors
+        while not queue.empty():
+            method, path, params, body = queue.get_nowait()
+            t0 = time.perf_counter()
+            r = await client.request(method, path, params=params, json=body)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "route": route,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+async def worker(args) -> List[dict]:
+    import httpx
+    import main
+    from search import search_index
+
+    seed = {"demo": seed_demo, "mongo": seed_mongo, "snapshot": seed_snapshot}[args.backend]
+    ids = seed(args.size)
+    with_episodes = ids[:ANIME_WITH_EPISODES]
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        while not search_index.ready:
+            await asyncio.sleep(0.1)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            first = (await client.get("/api/anime", params={"limit": 50})).json()
+            state = {"page2_cursor": first.get("next_cursor") or "", "episode_number": 10_000}
+            for route in args.routes:
+                res = await run_route(client, route, args.requests, args.concurrency, ids, with_episodes, state)
+                results.append({"backend": args.backend, "size": args.size, **res})
+    return results
+
+# ----------------------------------------------------------------------------- driver
+
+def run_child(backend: str, size: int, args) -> List[dict]:
+    env = dict(os.environ)
+    env.pop("DEMO_CATALOG_PATH", None)
+    env.pop("CATALOG_SNAPSHOT", None)
+    if backend in ("demo", "snapshot"):
+        env.pop("DATABASE_URL", None)
+        env.pop("DATABASE_NAME", None)
+        if backend == "snapshot":
+            env["CATALOG_SNAPSHOT"] = os.path.join(tempfile.gettempdir(), f"load-{size}.snap")
+    else:
+        env["DATABASE_URL"] = args.mongo_url
+        env["DATABASE_NAME"] = args.mongo_db
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--worker",
+        "--backend", backend, "--size", str(size),
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        "--routes", *args.routes,
+    ]
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    finally:
+        if backend == "snapshot" and os.path.exists(env["CATALOG_SNAPSHOT"]):
+            os.remove(env["CATALOG_SNAPSHOT"])
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"{backend} size={size} failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """Describe every route that got slower (p95) or lost throughput by more than threshold"""
+    base = {(r["backend"], r["size"], r["route"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get((r["backend"], r["size"], r["route"]))
+        if b is None:
+            continue
+        if b["p95_ms"] and r["p95_ms"] > b["p95_ms"] * (1 + threshold):
+            regressions.append(f"{r['backend']}/{r['size']}/{r['route']}: p95 {b['p95_ms']}ms -> {r['p95_ms']}ms")
+        if b["rps"] and r["rps"] < b["rps"] * (1 - threshold):
+            regressions.append(f"{r['backend']}/{r['size']}/{r['route']}: rps {b['rps']} -> {r['rps']}")
+    return regressions
+
+def print_table(results: List[dict]):
+    print(f"{'backend':<8} {'size':>8} {'route':<15} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>5}")
+    for r in results:
+        print(
+            f"{r['backend']:<8} {r['size']:>8} {r['route']:<15} {r['rps']:>9.1f} "
+            f"{r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms {r['errors']:>5}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=["demo", "mongo", "snapshot"], default=["demo"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--mongo-db", default="anime_loadtest")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+    # internal: run one (backend, size) in this process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(asyncio.run(worker(args))))
+        return
+
+    results = []
+    for backend in args.backends:
+        for size in args.sizes:
+            print(f"running {backend} size={size} ...", file=sys.stderr)
+            results += run_child(backend, size, args)
+    print_table(results)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            raise SystemExit(1)
+        print("\nno regressions against baseline")
+
+if __name__ == "__main__":
+    main()
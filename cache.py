@@ -0,0 +1,211 @@
+"""
+Read-Through Cache
+
+Size-bounded LRU cache with per-entry TTL and tag based invalidation,
+plus a `cached` decorator that turns any sync or async loader (for example
+the helpers in database.py) into a read-through lookup.
+
+Entries can carry tags such as "anime:<id>" or "anime:list" so a write can
+drop exactly the views it affects. A load that was running when one of its
+tags was invalidated returns its result but does not store it, so a value
+read before a write never outlives the write. Concurrent misses for the
+same key share one load (singleflight.py).
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set
+
+from shared import shared_cache
+from singleflight import SingleFlight, catalog_flight
+
+_MISSING = object()
+# Invalidation generations are kept per hashed tag; a collision only makes
+# a load skip storing its result
+_GENERATION_SLOTS = 4096
+
+class LRUCache:
+    """Thread-safe LRU cache with TTL expiry, tags and hit/miss/eviction counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._generations = [0] * _GENERATION_SLOTS
+        self._cleared = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.discarded = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _generation(self, tags: tuple) -> tuple:
+        return (self._cleared, *(self._generations[hash(tag) % _GENERATION_SLOTS] for tag in tags))
+
+    def versions(self, tags: Iterable[str]) -> tuple:
+        """Token for the tags' invalidation state; pass it to set() to store only if none changed"""
+        with self._lock:
+            return self._generation(tuple(tags))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = (), versions: Optional[tuple] = None):
+        """Store value; with versions (from versions(tags)), skipped if a tag was invalidated since"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        tags = tuple(tags)
+        with self._lock:
+            if versions is not None and self._generation(tags) != versions:
+                self.discarded += 1
+                return
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, *tags: str):
+        """Drop every entry carrying any of the given tags"""
+        with self._lock:
+            for tag in tags:
+                self._generations[hash(tag) % _GENERATION_SLOTS] += 1
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            self._cleared += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "discarded": self.discarded,
+            }
+
+    def _drop(self, key: Hashable):
+        # caller holds the lock
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+def make_key(name: str, args: tuple, kwargs: dict) -> Hashable:
+    """Hashable key for a call; dict/list arguments (Mongo filters) are keyed by repr"""
+    def freeze(value):
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            return repr(value)
+    return (name, tuple(freeze(a) for a in args), tuple(sorted((k, freeze(v)) for k, v in kwargs.items())))
+
+def cached(
+    cache: LRUCache,
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+    ttl: Optional[float] = None,
+    name: Optional[str] = None,
+    flight: Optional[SingleFlight] = catalog_flight,
+):
+    """Read-through decorator for sync or async loaders.
+
+    `tags` receives the loader's arguments and returns the invalidation tags
+    for that entry. None results are cached too (negative caching) so misses
+    for unknown ids do not reach the database every time; results of loads
+    overtaken by an invalidation of their tags are not. Concurrent misses
+    for the same key are coalesced into one load through `flight` (pass
+    None to disable). Flights are keyed by the tags' invalidation state
+    too, so callers arriving after a write start a fresh load instead of
+    joining one that began before it.
+    """
+    def decorator(func):
+        key_name = name or func.__qualname__
+        tags_for = tags or (lambda *a, **kw: ())
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(key_name, args, kwargs)
+                value = cache.get(key, _MISSING)
+                if value is _MISSING:
+                    entry_tags = tuple(tags_for(*args, **kwargs))
+                    versions = cache.versions(entry_tags)
+                    async def load():
+                        loaded = await func(*args, **kwargs)
+                        cache.set(key, loaded, ttl=ttl, tags=entry_tags, versions=versions)
+                        return loaded
+                    value = await flight.do((key, versions), load) if flight is not None else await load()
+                return value
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(key_name, args, kwargs)
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                entry_tags = tuple(tags_for(*args, **kwargs))
+                versions = cache.versions(entry_tags)
+                def load():
+                    loaded = func(*args, **kwargs)
+                    cache.set(key, loaded, ttl=ttl, tags=entry_tags, versions=versions)
+                    return loaded
+                value = flight.do_sync((key, versions), load) if flight is not None else load()
+            return value
+        return wrapper
+
+    return decorator
+
+# Shared catalog cache; size and TTL can be tuned per deployment. With
+# SHARED_STATE_DIR set, all workers use one cache in shared memory instead
+_CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", 2048))
+_CACHE_TTL = float(os.getenv("CACHE_TTL", 60))
+catalog_cache = shared_cache("catalog", _CACHE_MAXSIZE, _CACHE_TTL)
+if catalog_cache is None:
+    catalog_cache = LRUCache(maxsize=_CACHE_MAXSIZE, ttl=_CACHE_TTL)
@@ -0,0 +1,131 @@
+"""
+In-Memory Catalog
+
+Indexed store used when no database is configured (demo / edge / test
+mode). It keeps:
+- an id -> anime hash index
+- the anime ids in title order (case-insensitive, like the Mongo collation)
+- per anime, its episodes pre-sorted by number
+
+Lookups are O(1) by id and O(log n) for page positions; writes update the
+indexes in place, so the catalog is built once and never re-sorted per
+request.
+"""
+
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+def title_key(title: Optional[str]) -> str:
+    return (title or "").casefold()
+
+class MemoryCatalog:
+    """Anime and episode dicts (already in response shape) with sorted indexes"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._anime: Dict[str, dict] = {}
+        self._title_order: List[Tuple[str, str]] = []
+        self._episodes: Dict[str, List[dict]] = {}
+        self._episode_numbers: Dict[str, List[int]] = {}
+        self._episode_count = 0
+
+    @property
+    def anime_count(self) -> int:
+        return len(self._anime)
+
+    @property
+    def episode_count(self) -> int:
+        return self._episode_count
+
+    def load(self, anime: Iterable[dict], episodes: Iterable[dict]):
+        """Replace the contents in bulk, sorting each index once"""
+        with self._lock:
+            self._anime = {a["id"]: a for a in anime}
+            self._title_order = sorted((title_key(a.get("title")), a["id"]) for a in self._anime.values())
+            grouped: Dict[str, Dict[int, dict]] = {}
+            for ep in episodes:
+                # later duplicates of (anime_id, number) win, like an upsert
+                grouped.setdefault(ep["anime_id"], {})[ep["number"]] = ep
+            self._episodes = {aid: [eps[n] for n in sorted(eps)] for aid, eps in grouped.items()}
+            self._episode_numbers = {aid: [e["number"] for e in eps] for aid, eps in self._episodes.items()}
+            self._episode_count = sum(len(eps) for eps in self._episodes.values())
+
+    def add_anime(self, doc: dict):
+        with self._lock:
+            old = self._anime.get(doc["id"])
+            if old is not None:
+                pos = bisect.bisect_left(self._title_order, (title_key(old.get("title")), old["id"]))
+                del self._title_order[pos]
+            self._anime[doc["id"]] = doc
+            bisect.insort(self._title_order, (title_key(doc.get("title")), doc["id"]))
+
+    def add_episode(self, doc: dict):
+        """Insert an episode; raises ValueError if the anime already has that number"""
+        with self._lock:
+            episodes = self._episodes.setdefault(doc["anime_id"], [])
+            numbers = self._episode_numbers.setdefault(doc["anime_id"], [])
+            pos = bisect.bisect_left(numbers, doc["number"])
+            if pos < len(numbers) and numbers[pos] == doc["number"]:
+                raise ValueError(f"Episode {doc['number']} already exists")
+            numbers.insert(pos, doc["number"])
+            episodes.insert(pos, doc)
+            self._episode_count += 1
+
+    def get_anime(self, anime_id: str) -> Optional[dict]:
+        return self._anime.get(anime_id)
+
+    def all_anime(self) -> List[dict]:
+        with self._lock:
+            return list(self._anime.values())
+
+    def all_episodes(self) -> Iterator[dict]:
+        """Every episode, grouped by anime and in number order"""
+        with self._lock:
+            groups = list(self._episodes.values())
+        for episodes in groups:
+            yield from list(episodes)
+
+    def page_anime(
+        self,
+        limit: int,
+        after: Optional[Tuple[Any, str]] = None,
+        match: Optional[Callable[[dict], bool]] = None,
+    ) -> List[dict]:
+        """Up to limit anime in title order strictly after the (title, id) position.
+
+        With match, non-matching anime are skipped (a scan from the position).
+        """
+        with self._lock:
+            start = 0
+            if after is not None:
+                start = bisect.bisect_right(self._title_order, (title_key(after[0]), after[1]))
+            if match is None:
+                return [self._anime[aid] for _, aid in self._title_order[start:start + limit]]
+            items = []
+            for pos in range(start, len(self._title_order)):
+                doc = self._anime[self._title_order[pos][1]]
+                if match(doc):
+                    items.append(doc)
+                    if len(items) >= limit:
+                        break
+            return items
+
+    def page_episodes(
+        self,
+        anime_id: str,
+        limit: int,
+        after_number: Optional[int] = None,
+        up_to_number: Optional[int] = None,
+    ) -> List[dict]:
+        """Up to limit episodes with after_number < number <= up_to_number"""
+        with self._lock:
+            numbers = self._episode_numbers.get(anime_id)
+            if not numbers:
+                return []
+            start = bisect.bisect_right(numbers, after_number) if after_number is not None else 0
+            end = bisect.bisect_right(numbers, up_to_number) if up_to_number is not None else len(numbers)
+            return self._episodes[anime_id][start:min(end, start + limit)]
+
+# Store backing the demo/offline mode
+demo_catalog = MemoryCatalog()
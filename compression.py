@@ -0,0 +1,111 @@
+"""
+Response Compression
+
+gzip / brotli negotiation by Accept-Encoding, with encoded bodies cached
+by ETag. Catalog ETags already change with every catalog version and
+query string, so a cached body is reused until a write bumps the version:
+each variant is serialized and compressed once per version instead of
+once per request.
+
+Compressed variants get their own strong ETag ("<etag>-gzip", "<etag>-br");
+versioning.conditional_get accepts those back in If-None-Match and answers
+with the same ETag and Vary the 200 carried.
+"""
+
+import gzip
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from cache import LRUCache
+from shared import shared_cache
+from serialization import dumps
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies smaller than this are sent as is; compression would barely pay for its headers
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 512))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# (path, etag, coding) -> (coding used, body); ETags are only unique per path. Our writes
+# change the ETag; the TTL (by default the catalog cache's) bounds staleness after writes
+# made outside this process. Shared between workers when SHARED_STATE_DIR is set
+_BODY_CACHE_MAXSIZE = int(os.getenv("BODY_CACHE_MAXSIZE", 512))
+_BODY_CACHE_TTL = float(os.getenv("BODY_CACHE_TTL", os.getenv("CACHE_TTL", 60)))
+body_cache = shared_cache("bodies", _BODY_CACHE_MAXSIZE, _BODY_CACHE_TTL)
+if body_cache is None:
+    body_cache = LRUCache(maxsize=_BODY_CACHE_MAXSIZE, ttl=_BODY_CACHE_TTL)
+
+def _encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    encoders = {}
+    if brotli is not None:
+        encoders["br"] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    encoders["gzip"] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return encoders
+
+# In order of preference when the client accepts several with the same q
+ENCODERS = _encoders()
+
+def negotiate(accept_encoding: Optional[str]) -> str:
+    """Best supported content coding for an Accept-Encoding header, or "identity" """
+    if not accept_encoding:
+        return "identity"
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = "identity", 0.0
+    for coding in ENCODERS:
+        q = weights.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """ETag of the representation in the given content coding"""
+    return etag if encoding == "identity" else f'{etag[:-1]}-{encoding}"'
+
+async def _variant(path: str, etag: Optional[str], encoding: str, build: Callable[[], Awaitable[Any]]) -> Tuple[str, bytes]:
+    """(content coding actually used, body) of one representation, cached per path and ETag"""
+    key = (path, etag, encoding)
+    variant = body_cache.get(key) if etag else None
+    if variant is not None:
+        return variant
+    if encoding == "identity":
+        variant = ("identity", dumps(await build()))
+    else:
+        _, raw = await _variant(path, etag, "identity", build)
+        # small bodies are sent uncompressed whatever the client accepts
+        variant = (encoding, ENCODERS[encoding](raw)) if len(raw) >= COMPRESS_MIN_SIZE else ("identity", raw)
+    if etag:
+        body_cache.set(key, variant)
+    return variant
+
+async def encoded_response(request: Request, response: Response, build: Callable[[], Awaitable[Any]]) -> Response:
+    """JSON response for the payload build() returns, compressed as negotiated.
+
+    Bodies are cached under the path and the ETag already set on response
+    (by versioning.conditional_get), so on a hit build() is not called at all.
+    """
+    etag = response.headers.get("etag")
+    encoding, body = await _variant(request.url.path, etag, negotiate(request.headers.get("accept-encoding")), build)
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    headers["vary"] = "Accept-Encoding"
+    if encoding != "identity":
+        headers["content-encoding"] = encoding
+        if etag:
+            headers["etag"] = variant_etag(etag, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
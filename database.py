@@ -5,44 +5,223 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from pymongo import DeleteOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
 from pydantic import BaseModel
 
+from cache import cached, catalog_cache
+from metrics import mongo_listeners
+from pagination import mongo_id
+
 # Load environment variables from .env file
 load_dotenv()
 
 _client = None
 db = None
 
+# Async (motor) handle for request handlers; the sync one above stays for scripts
+_async_client = None
+async_db = None
+
+# Operations per bulk_write in the *_documents helpers
+BULK_WRITE_BATCH_SIZE = int(os.getenv("BULK_WRITE_BATCH_SIZE", 1000))
+
+# Documents per getMore round trip in iter_documents
+ITER_BATCH_SIZE = int(os.getenv("ITER_BATCH_SIZE", 1000))
+
+# Pass as write_concern= for analytics writes that may be lost: no acknowledgement round trip
+UNACKNOWLEDGED = WriteConcern(w=0)
+
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    # Command / pool listeners feed the /metrics endpoint
+    _client = MongoClient(database_url, event_listeners=mongo_listeners())
     db = _client[database_name]
+    _async_client = AsyncIOMotorClient(database_url, event_listeners=mongo_listeners())
+    async_db = _async_client[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-
+def _prepare_document(data: Union[BaseModel, dict], now: datetime = None) -> dict:
+    """Convert input to a dict and stamp created/updated timestamps (batches pass one shared now)"""
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+    return data_dict
+
+def _update_fields(data: Union[BaseModel, dict], now: datetime) -> dict:
+    """$set fields for an update: only the fields given (set on a model), plus updated_at"""
+    if isinstance(data, BaseModel):
+        fields = data.model_dump(exclude_unset=True)
+    else:
+        fields = dict(data)
+    fields.pop('_id', None)
+    fields.pop('created_at', None)
+    fields['updated_at'] = now
+    return fields
+
+def _update_op(filter_dict: dict, data: Union[BaseModel, dict], now: datetime, upsert: bool = False) -> UpdateOne:
+    update = {"$set": _update_fields(data, now)}
+    if upsert:
+        update["$setOnInsert"] = {"created_at": now}
+    return UpdateOne(filter_dict, update, upsert=upsert)
+
+def _batches(ops: Iterable, size: int) -> Iterable[list]:
+    ops = iter(ops)
+    while True:
+        batch = list(islice(ops, size))
+        if not batch:
+            return
+        yield batch
 
-    result = db[collection_name].insert_one(data_dict)
+def _empty_write_result() -> dict:
+    return {"matched": 0, "modified": 0, "upserted_ids": [], "deleted": 0, "errors": [], "acknowledged": True}
+
+def _add_write_result(total: dict, result, offset: int):
+    """Fold one bulk_write result (or BulkWriteError details) into the running total"""
+    if isinstance(result, dict):
+        # BulkWriteError.details; ops before and after a failed one still ran (unordered)
+        total["matched"] += result.get("nMatched", 0)
+        total["modified"] += result.get("nModified", 0)
+        total["deleted"] += result.get("nRemoved", 0)
+        total["upserted_ids"] += [{"index": offset + u["index"], "id": str(u["_id"])} for u in result.get("upserted", [])]
+        total["errors"] += [
+            {"index": offset + e["index"], "error": e.get("errmsg", "write error")}
+            for e in result.get("writeErrors", [])
+        ]
+    elif not result.acknowledged:
+        total["acknowledged"] = False
+    else:
+        total["matched"] += result.matched_count
+        total["modified"] += result.modified_count
+        total["deleted"] += result.deleted_count
+        total["upserted_ids"] += [{"index": offset + i, "id": str(_id)} for i, _id in result.upserted_ids.items()]
+
+def _collection(database, collection_name: str, write_concern: Optional[WriteConcern] = None):
+    if database is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    collection = database[collection_name]
+    return collection.with_options(write_concern=write_concern) if write_concern is not None else collection
+
+def _insert_many_result(docs: List[dict], error: BulkWriteError = None, ordered: bool = False) -> dict:
+    """Per-item outcome of an insert_many: ids aligned with docs (None on failure) and errors"""
+    errors = []
+    if error is not None:
+        errors = [
+            {"index": e["index"], "error": e.get("errmsg", "write error")}
+            for e in error.details.get("writeErrors", [])
+        ]
+    failed = {e["index"] for e in errors}
+    if ordered and errors:
+        # ordered inserts stop at the first error; the rest were never attempted
+        first = min(failed)
+        skipped = [i for i in range(first + 1, len(docs)) if i not in failed]
+        errors += [{"index": i, "error": "not attempted after earlier error"} for i in skipped]
+        failed.update(skipped)
+    ids = [None if i in failed else str(doc["_id"]) for i, doc in enumerate(docs)]
+    return {"inserted_ids": ids, "errors": errors}
+
+def collection_tag(collection_name: str) -> str:
+    """Cache tag shared by every cached read of a collection"""
+    return f"collection:{collection_name}"
+
+# Helper functions for common database operations
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db[collection_name].insert_one(_prepare_document(data))
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
     return str(result.inserted_id)
 
+def create_documents(collection_name: str, items: Iterable[Union[BaseModel, dict]], ordered: bool = False):
+    """Insert many documents in one insert_many round trip; reports per-item ids and errors"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = datetime.now(timezone.utc)
+    docs = [_prepare_document(item, now) for item in items]
+    if not docs:
+        return {"inserted_ids": [], "errors": []}
+    error = None
+    try:
+        db[collection_name].insert_many(docs, ordered=ordered)
+    except BulkWriteError as e:
+        error = e
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return _insert_many_result(docs, error, ordered)
+
+def update_document(collection_name: str, doc_id: str, data: Union[BaseModel, dict], write_concern: Optional[WriteConcern] = None) -> bool:
+    """$set the given fields (and updated_at) on one document; True if it exists"""
+    collection = _collection(db, collection_name, write_concern)
+    result = collection.update_one({"_id": mongo_id(doc_id)}, {"$set": _update_fields(data, datetime.now(timezone.utc))})
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return not result.acknowledged or result.matched_count > 0
+
+def upsert_document(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict], write_concern: Optional[WriteConcern] = None) -> Optional[str]:
+    """Update the document matching filter_dict or insert it; returns the new id when inserted"""
+    collection = _collection(db, collection_name, write_concern)
+    result = collection.bulk_write([_update_op(filter_dict, data, datetime.now(timezone.utc), upsert=True)])
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return str(result.upserted_ids[0]) if result.acknowledged and result.upserted_ids else None
+
+def delete_document(collection_name: str, doc_id: str, write_concern: Optional[WriteConcern] = None) -> bool:
+    """Delete one document by id; True if it existed"""
+    collection = _collection(db, collection_name, write_concern)
+    result = collection.delete_one({"_id": mongo_id(doc_id)})
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return not result.acknowledged or result.deleted_count > 0
+
+def bulk_write_documents(
+    collection_name: str,
+    ops: Iterable,
+    write_concern: Optional[WriteConcern] = None,
+    batch_size: int = BULK_WRITE_BATCH_SIZE,
+) -> dict:
+    """Run pymongo write ops as unordered bulk_write batches; per-op errors are reported by index.
+
+    Returns matched/modified/deleted counts, upserted ids and errors summed
+    over the batches; with an unacknowledged write concern the counts stay 0
+    and acknowledged is False.
+    """
+    collection = _collection(db, collection_name, write_concern)
+    total, offset = _empty_write_result(), 0
+    for batch in _batches(ops, batch_size):
+        try:
+            _add_write_result(total, collection.bulk_write(batch, ordered=False), offset)
+        except BulkWriteError as e:
+            _add_write_result(total, e.details, offset)
+        offset += len(batch)
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return total
+
+def update_documents(collection_name: str, updates: Iterable[Tuple[dict, Union[BaseModel, dict]]], upsert: bool = False, **options) -> dict:
+    """Apply (filter, fields) pairs as batched UpdateOne ops ($set, upsert optional)"""
+    now = datetime.now(timezone.utc)
+    return bulk_write_documents(collection_name, (_update_op(f, data, now, upsert) for f, data in updates), **options)
+
+def upsert_documents(collection_name: str, items: Iterable[Tuple[dict, Union[BaseModel, dict]]], **options) -> dict:
+    """Update or insert each (filter, fields) pair, in batches"""
+    return update_documents(collection_name, items, upsert=True, **options)
+
+def delete_documents(collection_name: str, doc_ids: Iterable[str], **options) -> dict:
+    """Delete documents by id, in batches"""
+    return bulk_write_documents(collection_name, (DeleteOne({"_id": mongo_id(i)}) for i in doc_ids), **options)
+
 def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
@@ -53,3 +232,133 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+def iter_documents(
+    collection_name: str,
+    filter_dict: dict = None,
+    projection: dict = None,
+    batch_size: int = ITER_BATCH_SIZE,
+    sort: list = None,
+) -> Iterator[dict]:
+    """Yield documents one at a time; memory holds one batch of batch_size, whatever the collection size"""
+    cursor = _collection(db, collection_name).find(filter_dict or {}, projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    try:
+        yield from cursor
+    finally:
+        # also when the caller stops early, so the server-side cursor does not linger
+        cursor.close()
+
+# Async counterparts for use inside request handlers (non-blocking)
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp (async)"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = await async_db[collection_name].insert_one(_prepare_document(data))
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return str(result.inserted_id)
+
+async def create_documents_async(collection_name: str, items: Iterable[Union[BaseModel, dict]], ordered: bool = False):
+    """Insert many documents in one insert_many round trip (async)"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    now = datetime.now(timezone.utc)
+    docs = [_prepare_document(item, now) for item in items]
+    if not docs:
+        return {"inserted_ids": [], "errors": []}
+    error = None
+    try:
+        await async_db[collection_name].insert_many(docs, ordered=ordered)
+    except BulkWriteError as e:
+        error = e
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return _insert_many_result(docs, error, ordered)
+
+async def update_document_async(collection_name: str, doc_id: str, data: Union[BaseModel, dict], write_concern: Optional[WriteConcern] = None) -> bool:
+    """$set the given fields (and updated_at) on one document (async)"""
+    collection = _collection(async_db, collection_name, write_concern)
+    result = await collection.update_one({"_id": mongo_id(doc_id)}, {"$set": _update_fields(data, datetime.now(timezone.utc))})
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return not result.acknowledged or result.matched_count > 0
+
+async def upsert_document_async(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict], write_concern: Optional[WriteConcern] = None) -> Optional[str]:
+    """Update the document matching filter_dict or insert it (async)"""
+    collection = _collection(async_db, collection_name, write_concern)
+    result = await collection.bulk_write([_update_op(filter_dict, data, datetime.now(timezone.utc), upsert=True)])
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return str(result.upserted_ids[0]) if result.acknowledged and result.upserted_ids else None
+
+async def delete_document_async(collection_name: str, doc_id: str, write_concern: Optional[WriteConcern] = None) -> bool:
+    """Delete one document by id (async)"""
+    collection = _collection(async_db, collection_name, write_concern)
+    result = await collection.delete_one({"_id": mongo_id(doc_id)})
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return not result.acknowledged or result.deleted_count > 0
+
+async def bulk_write_documents_async(
+    collection_name: str,
+    ops: Iterable,
+    write_concern: Optional[WriteConcern] = None,
+    batch_size: int = BULK_WRITE_BATCH_SIZE,
+) -> dict:
+    """Run pymongo write ops as unordered bulk_write batches (async)"""
+    collection = _collection(async_db, collection_name, write_concern)
+    total, offset = _empty_write_result(), 0
+    for batch in _batches(ops, batch_size):
+        try:
+            _add_write_result(total, await collection.bulk_write(batch, ordered=False), offset)
+        except BulkWriteError as e:
+            _add_write_result(total, e.details, offset)
+        offset += len(batch)
+    catalog_cache.invalidate_tag(collection_tag(collection_name))
+    return total
+
+async def update_documents_async(collection_name: str, updates: Iterable[Tuple[dict, Union[BaseModel, dict]]], upsert: bool = False, **options) -> dict:
+    """Apply (filter, fields) pairs as batched UpdateOne ops (async)"""
+    now = datetime.now(timezone.utc)
+    return await bulk_write_documents_async(collection_name, (_update_op(f, data, now, upsert) for f, data in updates), **options)
+
+async def upsert_documents_async(collection_name: str, items: Iterable[Tuple[dict, Union[BaseModel, dict]]], **options) -> dict:
+    """Update or insert each (filter, fields) pair, in batches (async)"""
+    return await update_documents_async(collection_name, items, upsert=True, **options)
+
+async def delete_documents_async(collection_name: str, doc_ids: Iterable[str], **options) -> dict:
+    """Delete documents by id, in batches (async)"""
+    return await bulk_write_documents_async(collection_name, (DeleteOne({"_id": mongo_id(i)}) for i in doc_ids), **options)
+
+async def get_documents_async(collection_name: str, filter_dict: dict = None, limit: int = None):
+    """Get documents from collection (async)"""
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = async_db[collection_name].find(filter_dict or {})
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return await cursor.to_list(length=None)
+
+async def iter_documents_async(
+    collection_name: str,
+    filter_dict: dict = None,
+    projection: dict = None,
+    batch_size: int = ITER_BATCH_SIZE,
+    sort: list = None,
+) -> AsyncIterator[dict]:
+    """Yield documents one at a time, one batch in memory (async)"""
+    cursor = _collection(async_db, collection_name).find(filter_dict or {}, projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    try:
+        async for doc in cursor:
+            yield doc
+    finally:
+        await cursor.close()
+
+# Read-through cached variants; results are shared between callers, so treat them as read-only.
+# Inserts through create_document/create_document_async drop every cached read of that collection.
+_collection_tags = lambda collection_name, *args, **kwargs: [collection_tag(collection_name)]
+get_documents_cached = cached(catalog_cache, tags=_collection_tags, name="get_documents")(get_documents)
+get_documents_async_cached = cached(catalog_cache, tags=_collection_tags, name="get_documents_async")(get_documents_async)
@@ -0,0 +1,180 @@
+"""
+Buffered Event Ingestion (write-behind)
+
+Analytics events (episode plays, page views, user activity) are appended to
+a bounded in-memory buffer and written by one background thread with
+insert_many, per collection, whenever EVENT_BATCH_SIZE events are waiting
+or EVENT_FLUSH_INTERVAL seconds have passed. Enqueueing is a lock, an
+append and maybe a notify, so handlers never wait on Mongo.
+
+When the buffer is full (Mongo slow or down) enqueue applies backpressure:
+by default it raises BufferFull straight away, which handlers turn into a
+503; scripts can pass block=True to wait for room instead. Failed batches
+are retried with backoff while they fit in the buffer. close() flushes
+whatever is left; main.py calls it on shutdown and scripts get it at exit.
+
+Events are at-most-once: a crash loses what was still buffered.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from database import db
+
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 100_000))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", 1000))
+EVENT_FLUSH_INTERVAL = float(os.getenv("EVENT_FLUSH_INTERVAL", 1.0))
+_MAX_RETRY_DELAY = 30.0
+
+class BufferFull(Exception):
+    """Raised by EventBuffer.enqueue when the buffer has no room"""
+
+class EventBuffer:
+    """Bounded write-behind buffer of (collection, document) pairs"""
+
+    def __init__(self, database, maxsize: int = EVENT_BUFFER_SIZE, batch_size: int = EVENT_BATCH_SIZE, interval: float = EVENT_FLUSH_INTERVAL):
+        self.database = database
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self._events: deque = deque()
+        lock = threading.Lock()
+        # the writer waits on _cond for a full batch, blocked producers on _room
+        self._cond = threading.Condition(lock)
+        self._room = threading.Condition(lock)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._writing = 0
+        self.enqueued = 0
+        self.inserted = 0
+        self.flushes = 0
+        self.rejected = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._events)
+
+    def enqueue(self, collection_name: str, document: dict, block: bool = False, timeout: Optional[float] = None):
+        """Queue one document for collection_name, stamped with created_at now.
+
+        Raises BufferFull when there is no room (after waiting up to timeout
+        with block=True), and after close().
+        """
+        if self.database is None:
+            raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+        document = {**document, "created_at": datetime.now(timezone.utc)}
+        with self._cond:
+            if len(self._events) >= self.maxsize and block:
+                self._room.wait_for(lambda: len(self._events) < self.maxsize or self._closed, timeout)
+            if self._closed or len(self._events) >= self.maxsize:
+                self.rejected += 1
+                raise BufferFull(f"Event buffer full ({self.maxsize} events waiting)")
+            self._events.append((collection_name, document))
+            self.enqueued += 1
+            if self._thread is None:
+                self._start()
+            if len(self._events) >= self.batch_size:
+                self._cond.notify()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def _take(self) -> List[Tuple[str, dict]]:
+        with self._cond:
+            batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+            self._writing = len(batch)
+            self._room.notify_all()
+            return batch
+
+    def _write(self, by_collection: Dict[str, List[dict]]):
+        """insert_many per collection, removing each written one; raises if Mongo could not be reached"""
+        for collection_name, docs in list(by_collection.items()):
+            try:
+                self.database[collection_name].insert_many(docs, ordered=False)
+                self.inserted += len(docs)
+            except BulkWriteError as e:
+                # individual bad documents (e.g. duplicate keys after a retry) are not retried
+                failed = len(e.details.get("writeErrors", []))
+                self.inserted += len(docs) - failed
+                self.failed += failed
+            del by_collection[collection_name]
+        self.flushes += 1
+
+    def _run(self):
+        delay = 0.0
+        while True:
+            with self._cond:
+                if not self._closed and len(self._events) < self.batch_size:
+                    self._cond.wait(max(self.interval, delay))
+                closing = self._closed
+            batch = self._take()
+            while batch:
+                by_collection: Dict[str, List[dict]] = {}
+                for collection_name, document in batch:
+                    by_collection.setdefault(collection_name, []).append(document)
+                try:
+                    self._write(by_collection)
+                    delay = 0.0
+                except Exception:
+                    # Mongo unavailable: keep the unwritten events at the front while they fit and back off
+                    delay = min(max(delay * 2, self.interval), _MAX_RETRY_DELAY)
+                    leftover = [(c, d) for c, docs in by_collection.items() for d in docs]
+                    with self._cond:
+                        if closing:
+                            self.dropped += len(leftover) + len(self._events)
+                            self._events.clear()
+                        elif len(self._events) + len(leftover) > self.maxsize:
+                            self.dropped += len(leftover)
+                        else:
+                            self._events.extendleft(reversed(leftover))
+                    break
+                if not closing and len(self) < self.batch_size:
+                    break
+                batch = self._take()
+            self._writing = 0
+            if closing:
+                return
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wake the writer and wait until every queued event is written; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+        while (self._events or self._writing) and self._thread is not None and self._thread.is_alive():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Stop accepting events and write the remaining ones; dropped if Mongo is unreachable"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._events),
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "inserted": self.inserted,
+            "flushes": self.flushes,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+# Shared by the API and the schema_examples tracking helpers
+event_buffer = EventBuffer(db)
+atexit.register(event_buffer.close)
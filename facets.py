@@ -0,0 +1,137 @@
+"""
+Catalog Filters and Facets
+
+Tag (all/any) and year-range filters for the anime list, as a Mongo query
+for the database path and as a predicate for the in-memory catalogs, plus
+facet counts per tag and per year for a filter: one $facet aggregation on
+Mongo, one scan in memory. Tags compare case-insensitively everywhere,
+like the TITLE_COLLATION the list queries run with.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional
+
+from catalog import title_key
+
+FACET_TAG_LIMIT = 50
+
+class AnimeFilter:
+    """Validated filter parameters of the anime list"""
+
+    __slots__ = ("tags", "tag_mode", "year_from", "year_to")
+
+    def __init__(self, tags: Iterable[str] = (), tag_mode: str = "all", year_from: Optional[int] = None, year_to: Optional[int] = None):
+        if tag_mode not in ("all", "any"):
+            raise ValueError("tag_mode must be 'all' or 'any'")
+        if year_from is not None and year_to is not None and year_from > year_to:
+            raise ValueError("year_from must not be greater than year_to")
+        # repeated and comma separated values, de-duplicated case-insensitively
+        seen = {}
+        for raw in tags:
+            for tag in raw.split(","):
+                tag = tag.strip()
+                if tag and title_key(tag) not in seen:
+                    seen[title_key(tag)] = tag
+        self.tags = tuple(seen.values())
+        self.tag_mode = tag_mode
+        self.year_from = year_from
+        self.year_to = year_to
+
+    def __eq__(self, other):
+        return isinstance(other, AnimeFilter) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        # stable across processes: shared cache entries are keyed by repr
+        return f"AnimeFilter{self.key()!r}"
+
+    def __bool__(self):
+        return bool(self.tags) or self.year_from is not None or self.year_to is not None
+
+    def key(self) -> tuple:
+        """Hashable identity for cache keys"""
+        return (tuple(sorted(map(title_key, self.tags))), self.tag_mode if len(self.tags) > 1 else "all", self.year_from, self.year_to)
+
+    def query(self) -> dict:
+        """Mongo filter; run it with TITLE_COLLATION for case-insensitive tags"""
+        query: Dict[str, dict] = {}
+        if self.tags:
+            query["tags"] = {"$all" if self.tag_mode == "all" else "$in": list(self.tags)}
+        if self.year_from is not None or self.year_to is not None:
+            year = {}
+            if self.year_from is not None:
+                year["$gte"] = self.year_from
+            if self.year_to is not None:
+                year["$lte"] = self.year_to
+            query["year"] = year
+        return query
+
+    def predicate(self) -> Optional[Callable[[dict], bool]]:
+        """Match function for response-shaped dicts, or None when nothing is filtered"""
+        if not self:
+            return None
+        wanted = {title_key(t) for t in self.tags}
+        match_all = self.tag_mode == "all"
+        year_from, year_to = self.year_from, self.year_to
+
+        def match(doc: dict) -> bool:
+            if wanted:
+                have = {title_key(t) for t in doc.get("tags") or () if isinstance(t, str)}
+                if not (wanted <= have if match_all else wanted & have):
+                    return False
+            if year_from is not None or year_to is not None:
+                year = doc.get("year")
+                if year is None or (year_from is not None and year < year_from) or (year_to is not None and year > year_to):
+                    return False
+            return True
+
+        return match
+
+def facet_pipeline(match: dict, tag_limit: int = FACET_TAG_LIMIT) -> List[dict]:
+    """Single aggregation returning total, per-tag and per-year counts for the matched anime"""
+    return [
+        {"$match": match},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "tags": [
+                {"$unwind": "$tags"},
+                {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": tag_limit},
+            ],
+            "years": [
+                {"$match": {"year": {"$ne": None}}},
+                {"$group": {"_id": "$year", "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+        }},
+    ]
+
+def facet_result(doc: dict) -> dict:
+    """Response shape of a facet_pipeline result document"""
+    total = doc.get("total") or [{"count": 0}]
+    return {
+        "total": total[0]["count"],
+        "tags": [{"value": row["_id"], "count": row["count"]} for row in doc.get("tags", [])],
+        "years": [{"value": row["_id"], "count": row["count"]} for row in doc.get("years", [])],
+    }
+
+def facet_counts(docs: Iterable[dict], tag_limit: int = FACET_TAG_LIMIT) -> dict:
+    """facet_pipeline computed over in-memory documents"""
+    total = 0
+    tags: Dict[str, list] = {}
+    years: Dict[int, int] = {}
+    for doc in docs:
+        total += 1
+        for key, tag in {title_key(t): t for t in doc.get("tags") or () if isinstance(t, str)}.items():
+            # first spelling seen stands for the case-insensitive group
+            tags.setdefault(key, [tag, 0])[1] += 1
+        if doc.get("year") is not None:
+            years[doc["year"]] = years.get(doc["year"], 0) + 1
+    ranked = sorted(tags.values(), key=lambda row: (-row[1], row[0]))[:tag_limit]
+    return {
+        "total": total,
+        "tags": [{"value": value, "count": count} for value, count in ranked],
+        "years": [{"value": year, "count": years[year]} for year in sorted(years)],
+    }
@@ -0,0 +1,104 @@
+"""
+Bulk Ingestion Helpers
+
+Reads request bodies that carry many records, either a JSON array or a
+streamed NDJSON body (one JSON object per line), validates each record and
+writes them in fixed-size chunks. NDJSON uploads are consumed as they
+arrive, so memory stays bounded by the chunk size rather than the upload;
+JSON arrays have to be parsed whole before the first chunk is written.
+"""
+
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+import orjson
+from fastapi import Request
+from pydantic import ValidationError
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}" for err in error.errors()
+    )
+
+def _parse_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return orjson.loads(line), None
+    except orjson.JSONDecodeError as e:
+        return None, f"invalid JSON: {e}"
+
+async def iter_request_items(request: Request) -> AsyncIterator[Tuple[int, Any, Optional[str]]]:
+    """Yield (index, raw item, parse error) for every record in the request body"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        index = 0
+        pending = b""
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield (index, *_parse_line(line))
+                    index += 1
+        if pending.strip():
+            yield (index, *_parse_line(pending))
+        return
+
+    try:
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array or an NDJSON body")
+    for index, item in enumerate(data):
+        yield index, item, None
+
+async def bulk_ingest(
+    items: AsyncIterator[Tuple[int, Any, Optional[str]]],
+    validate: Callable[[Any], dict],
+    write: Callable[[List[dict]], Awaitable[dict]],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> dict:
+    """Validate records and write them in chunks; returns per-item ids and errors.
+
+    `write` receives a list of documents and returns the
+    {"inserted_ids", "errors"} shape of database.create_documents_async.
+    """
+    ids: List[dict] = []
+    errors: List[dict] = []
+    batch: List[dict] = []
+    batch_indexes: List[int] = []
+
+    async def flush():
+        if not batch:
+            return
+        result = await write(batch)
+        for pos, _id in enumerate(result["inserted_ids"]):
+            if _id is not None:
+                ids.append({"index": batch_indexes[pos], "id": _id})
+        for err in result["errors"]:
+            errors.append({"index": batch_indexes[err["index"]], "error": err["error"]})
+        batch.clear()
+        batch_indexes.clear()
+
+    async for index, raw, error in items:
+        if error is None:
+            try:
+                doc = validate(raw)
+            except ValidationError as e:
+                error = format_validation_error(e)
+            except (TypeError, ValueError) as e:
+                error = str(e)
+        if error is not None:
+            errors.append({"index": index, "error": error})
+            continue
+        batch.append(doc)
+        batch_indexes.append(index)
+        if len(batch) >= chunk_size:
+            await flush()
+    await flush()
+
+    errors.sort(key=lambda e: e["index"])
+    return {"inserted": len(ids), "failed": len(errors), "ids": ids, "errors": errors}
@@ -1,15 +1,46 @@
 import os
-from fastapi import FastAPI, HTTPException
+import asyncio
+import gc
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
-from database import db, create_document
-from schemas import Anime, Episode
+from database import db, async_db, create_document_async, create_documents_async, iter_documents_async
+from schemas import Anime, Episode, ViewEvent
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, decode_offset_cursor, encode_cursor, encode_offset_cursor,
+    keyset_filter, merge_filters, mongo_id, page_items,
+)
+from search import SearchIndex, search_index
+from typeahead import TYPEAHEAD_LIMIT, Typeahead, typeahead
+from cache import cached, catalog_cache
+from singleflight import FlightTimeout, catalog_flight
+from compression import body_cache, encoded_response
+from versioning import catalog_versions, conditional_get
+from serialization import dumps, json_response, output_defaults, output_fields, parse_fields, pick, projection, to_out
+from ingest import bulk_ingest, iter_request_items
+from indexes import ANIME_SORT, EPISODE_SORT, TITLE_COLLATION, ensure_indexes_async, explain_queries
+from catalog import demo_catalog, title_key
+from facets import FACET_TAG_LIMIT, AnimeFilter, facet_counts, facet_pipeline, facet_result
+from snapshot import SnapshotCatalog
+from shared import shared_counters
+from events import BufferFull, event_buffer
+from popularity import POPULARITY_FLUSH_INTERVAL, TRENDING_SIZE, most_watched, record_view, top_viewed, trending, view_counters
+import metrics
+from admission import AdmissionMiddleware, admission
 
 app = FastAPI(title="Anime API")
 
+# Innermost of the three: shed responses still get CORS headers and are measured
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,6 +48,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so latency includes CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(FlightTimeout)
+async def flight_timeout(request: Request, exc: FlightTimeout):
+    # the shared query is still running; later requests join it
+    return json_response({"detail": str(exc)}, status_code=504)
+
+@app.exception_handler(BufferFull)
+async def buffer_full(request: Request, exc: BufferFull):
+    # Mongo is not keeping up with event writes; clients should retry later
+    response = json_response({"detail": str(exc)}, status_code=503)
+    response.headers["retry-after"] = "1"
+    return response
 
 @app.get("/")
 def read_root():
@@ -39,14 +84,22 @@ def serialize_doc(doc: dict):
     return doc
 
 # -------- Demo fallback (when database is not configured) --------
-DEMO_ANIME: List[dict] = []
-DEMO_EPISODES: List[dict] = []
-
 HIANIME_URL = "https://hianime.cv"
 
+# Optional JSON fixture {"anime": [...], "episodes": [...]} to serve instead of the built-in seed
+DEMO_CATALOG_PATH = os.getenv("DEMO_CATALOG_PATH")
+
 def build_demo_data():
-    global DEMO_ANIME, DEMO_EPISODES
-    if DEMO_ANIME and DEMO_EPISODES:
+    """Load the in-memory demo catalog once at startup"""
+    if demo_catalog.anime_count:
+        return
+    if DEMO_CATALOG_PATH:
+        with open(DEMO_CATALOG_PATH) as f:
+            fixture = json.load(f)
+        demo_catalog.load(
+            [_anime_out(a) for a in fixture.get("anime", [])],
+            [_episode_out(e) for e in fixture.get("episodes", [])],
+        )
         return
     demo_anime_seed = [
         {
@@ -117,9 +170,9 @@ def build_demo_data():
         },
     ]
 
-    DEMO_ANIME = [serialize_doc(a) for a in demo_anime_seed]
+    demo_anime = [serialize_doc(a) for a in demo_anime_seed]
     eps: List[dict] = []
-    for a in DEMO_ANIME:
+    for a in demo_anime:
         for idx, vid in enumerate(sample_videos, start=1):
             eps.append(serialize_doc({
                 "id": f"{a['id']}-ep-{idx}",
@@ -131,17 +184,35 @@ def build_demo_data():
                 "duration": vid["duration"],
                 "external_url": HIANIME_URL,
             }))
-    DEMO_EPISODES = eps
+    demo_catalog.load(demo_anime, eps)
+
+# -------- Snapshot mode (read-only edge replicas without a database) --------
+# File written by `python snapshot.py export`; re-checked every CATALOG_SNAPSHOT_POLL seconds
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT")
+CATALOG_SNAPSHOT_POLL = float(os.getenv("CATALOG_SNAPSHOT_POLL", 5))
+snapshot_catalog = SnapshotCatalog(CATALOG_SNAPSHOT) if CATALOG_SNAPSHOT and db is None else None
+
+# Store behind the database-less read paths
+local_catalog = snapshot_catalog if snapshot_catalog is not None else demo_catalog
+
+def _check_writable():
+    if snapshot_catalog is not None:
+        raise HTTPException(405, "Catalog is served from a read-only snapshot")
 
 # Seed demo content if collections are empty
 @app.on_event("startup")
 async def seed_if_empty():
+    # A configured snapshot must open; a missing or corrupt file fails startup
+    if snapshot_catalog is not None:
+        snapshot_catalog.reload_if_changed()
+        _snapshot_loaded()
+        return
     try:
         # If no database configured, prepare demo fallback
         if db is None:
             build_demo_data()
             return
-        if db["anime"].count_documents({}) == 0:
+        if await async_db["anime"].count_documents({}) == 0:
             demo_anime = [
                 {
                     "title": "Big Brother",
@@ -207,7 +278,7 @@ async def seed_if_empty():
             ]
 
             for a in demo_anime:
-                a_id = db["anime"].insert_one(a).inserted_id
+                a_id = (await async_db["anime"].insert_one(a)).inserted_id
                 eps = []
                 for idx, vid in enumerate(sample_videos, start=1):
                     eps.append({
@@ -219,11 +290,153 @@ async def seed_if_empty():
                         "duration": vid["duration"],
                         "external_url": HIANIME_URL,
                     })
-                db["episode"].insert_many(eps)
+                await async_db["episode"].insert_many(eps)
     except Exception:
         # ignore seeding errors in ephemeral env
         pass
 
+# Keep references to fire-and-forget startup tasks so they are not garbage collected
+_background_tasks = set()
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def _snapshot_loaded():
+    # ETags of one snapshot are the same in every worker and all change on a swap
+    catalog_versions.epoch = snapshot_catalog.version
+    _spawn(_load_snapshot_search_index(snapshot_catalog.current))
+
+def _build_typeahead(titles: List[Tuple[str, str]]) -> Typeahead:
+    """A typeahead index of (id, title) pairs; run in a thread for large catalogs"""
+    index = Typeahead()
+    index.load(titles)
+    return index
+
+# Opt-in startup step: once the first indexes are built, gc.freeze() moves every
+# object alive into the permanent generation so full collections stop walking
+# millions of index objects during lookups. Process-wide and one-off: nothing
+# alive at that moment is collected afterwards, and later rebuilds are not frozen
+GC_FREEZE_AFTER_STARTUP = os.getenv("GC_FREEZE_AFTER_STARTUP") == "1"
+
+def _startup_indexes_loaded():
+    if GC_FREEZE_AFTER_STARTUP and not gc.get_freeze_count():
+        gc.freeze()
+
+async def _load_snapshot_search_index(snapshot):
+    # Built off to the side and swapped in, so startup and swaps stay O(1);
+    # until then searches scan titles and after a swap the old index is used
+    index = SearchIndex()
+    titles = []
+    typeahead.begin_rebuild()
+
+    def docs():
+        for a in snapshot.all_anime():
+            titles.append((a["id"], a.get("title")))
+            yield a["id"], a
+
+    await asyncio.to_thread(index.add_many, docs())
+    titles_index = await asyncio.to_thread(_build_typeahead, titles)
+    if snapshot_catalog.current is snapshot:
+        search_index.swap(index)
+        typeahead.swap(titles_index)
+        catalog_versions.bump("anime")
+        _startup_indexes_loaded()
+
+async def _watch_snapshot():
+    while True:
+        await asyncio.sleep(CATALOG_SNAPSHOT_POLL)
+        try:
+            if snapshot_catalog.reload_if_changed():
+                _snapshot_loaded()
+        except (OSError, ValueError):
+            # missing or invalid file: keep serving the current snapshot
+            pass
+
+# Multi-worker mode: how often each worker looks for titles other workers created
+SEARCH_SYNC_INTERVAL = float(os.getenv("SEARCH_SYNC_INTERVAL", 2))
+
+async def _sync_search_index(since: datetime):
+    """Index anime written by other workers since the last pass, when the shared version moved"""
+    seen = catalog_versions.get("anime")
+    while True:
+        await asyncio.sleep(SEARCH_SYNC_INTERVAL)
+        version = catalog_versions.get("anime")
+        if version == seen:
+            continue
+        started = datetime.now(timezone.utc)
+        try:
+            # small overlap so writes racing the previous pass are not missed
+            query = {"updated_at": {"$gte": since - timedelta(seconds=1)}}
+            changed = False
+            async for doc in async_db["anime"].find(query, {"title": 1, "description": 1, "tags": 1}):
+                changed |= search_index.add(str(doc["_id"]), doc)
+                typeahead.add(str(doc["_id"]), doc.get("title"))
+            seen, since = version, started
+            if changed:
+                # search bodies this worker cached (in the shared body cache) under the
+                # writer's version predate these docs; a re-applied doc is unchanged and
+                # does not bump again, so workers do not keep waking each other
+                catalog_versions.bump("anime")
+        except Exception:
+            pass
+
+async def _load_search_index():
+    if shared_counters is not None:
+        _spawn(_sync_search_index(datetime.now(timezone.utc)))
+    typeahead.begin_rebuild()
+    try:
+        titles = []
+        async for doc in async_db["anime"].find({}, {"title": 1, "description": 1, "tags": 1}):
+            search_index.add(str(doc["_id"]), doc)
+            titles.append((str(doc["_id"]), doc.get("title")))
+        typeahead.swap(await asyncio.to_thread(_build_typeahead, titles))
+        search_index.ready = True
+        # search responses built from the fallback must not outlive it
+        catalog_versions.bump("anime")
+        _startup_indexes_loaded()
+    except Exception:
+        # search keeps using the regex fallback until the index is available
+        typeahead.cancel_rebuild()
+
+# Create the indexes the list endpoints depend on without delaying startup
+@app.on_event("startup")
+async def create_indexes():
+    if db is not None:
+        _spawn(ensure_indexes_async(async_db))
+
+# Build the search index after seeding; large catalogs load in the background
+@app.on_event("startup")
+async def build_search_index():
+    if snapshot_catalog is not None:
+        _spawn(_watch_snapshot())
+        return
+    if db is None:
+        build_demo_data()
+        search_index.add_many((a["id"], a) for a in demo_catalog.all_anime())
+        search_index.ready = True
+        typeahead.load((a["id"], a.get("title")) for a in demo_catalog.all_anime())
+        return
+    _spawn(_load_search_index())
+
+async def _flush_view_counts():
+    """Write view increments every POPULARITY_FLUSH_INTERVAL and refresh most watched"""
+    while True:
+        try:
+            await view_counters.flush(async_db)
+            most_watched.replace(await top_viewed(async_db, most_watched.k))
+        except Exception:
+            # counts stay pending until Mongo is back
+            pass
+        await asyncio.sleep(POPULARITY_FLUSH_INTERVAL)
+
+@app.on_event("startup")
+async def start_view_counters():
+    if db is not None:
+        _spawn(_flush_view_counts())
+
 # Schemas for responses
 class AnimeOut(BaseModel):
     id: str
@@ -244,60 +457,638 @@ class EpisodeOut(BaseModel):
     duration: Optional[int] = None
     external_url: Optional[str] = None
 
+class AnimePage(BaseModel):
+    items: List[AnimeOut]
+    next_cursor: Optional[str] = None
+
+class EpisodePage(BaseModel):
+    items: List[EpisodeOut]
+    next_cursor: Optional[str] = None
+
+class RankedAnime(AnimeOut):
+    score: float
+
+class RankedPage(BaseModel):
+    items: List[RankedAnime]
+
+class AnimeTitle(BaseModel):
+    id: str
+    title: str
+
+class TitleSuggestions(BaseModel):
+    items: List[AnimeTitle]
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class YearCount(BaseModel):
+    value: int
+    count: int
+
+class AnimeFacets(BaseModel):
+    total: int
+    tags: List[FacetCount]
+    years: List[YearCount]
+
+# Trusted DB output is converted once, projected to these fields and encoded
+# straight to bytes; returning a Response skips response_model revalidation
+ANIME_FIELDS = output_fields(AnimeOut)
+ANIME_DEFAULTS = output_defaults(AnimeOut)
+ANIME_PROJECTION = projection(ANIME_FIELDS)
+EPISODE_FIELDS = output_fields(EpisodeOut)
+EPISODE_DEFAULTS = output_defaults(EpisodeOut)
+EPISODE_PROJECTION = projection(EPISODE_FIELDS)
+
+def _anime_out(doc: dict, fields: Tuple[str, ...] = ANIME_FIELDS) -> dict:
+    return to_out(doc, fields, ANIME_DEFAULTS)
+
+def _episode_out(doc: dict, fields: Tuple[str, ...] = EPISODE_FIELDS) -> dict:
+    return to_out(doc, fields, EPISODE_DEFAULTS)
+
+# Sparse fieldsets: fields=title,year returns (and fetches from Mongo) only id and those fields
+def _select_fields(fields: Optional[str], allowed: Tuple[str, ...]) -> Tuple[str, ...]:
+    if fields is None:
+        return allowed
+    try:
+        return parse_fields(fields, allowed)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def _with_field(fields: Tuple[str, ...], name: str) -> Tuple[str, ...]:
+    """fields plus the sort key a page cursor is built from"""
+    return fields if name in fields else (*fields, name)
+
+def _page(items: List[dict], limit: int, sort_field: str, fields: Tuple[str, ...], all_fields: Tuple[str, ...]) -> dict:
+    items, next_cursor = page_items(items, limit, sort_field)
+    if fields != all_fields:
+        items = [pick(item, fields) for item in items]
+    return {"items": items, "next_cursor": next_cursor}
+
+def _cursor_filter(field: str, cursor: Optional[str], unique: bool = False) -> dict:
+    try:
+        return keyset_filter(field, cursor, unique)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+def _cursor_position(cursor: Optional[str], value_type: type = str):
+    """Decoded (value, id) of a cursor for the in-memory catalog"""
+    if not cursor:
+        return None
+    try:
+        value, doc_id = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(value, value_type):
+        raise HTTPException(400, "Invalid cursor")
+    return value, doc_id
+
+def _anime_filter(tags: List[str], tag_mode: str, year_from: Optional[int], year_to: Optional[int]) -> AnimeFilter:
+    try:
+        return AnimeFilter(tags, tag_mode, year_from, year_to)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def _filter_query(filt: AnimeFilter) -> Tuple[dict, Optional[dict]]:
+    """Mongo filter and the collation it needs (tags compare case-insensitively)"""
+    return filt.query(), TITLE_COLLATION if filt.tags else None
+
+# Filtered searches resolve ranked ids against the filter this many at a time
+SEARCH_FILTER_CHUNK = 500
+
+async def _ranked_anime(ids: List[str], fields: Tuple[str, ...], filt: AnimeFilter, wanted: int) -> List[dict]:
+    """The first wanted anime of ids (in rank order) that match the filter"""
+    match = filt.predicate()
+    query, collation = _filter_query(filt)
+    items: List[dict] = []
+    step = SEARCH_FILTER_CHUNK if filt else max(len(ids), 1)
+    for start in range(0, len(ids), step):
+        chunk = ids[start:start + step]
+        if db is None:
+            items += [a for a in map(local_catalog.get_anime, chunk) if a and (match is None or match(a))]
+        else:
+            in_chunk = merge_filters({"_id": {"$in": [mongo_id(i) for i in chunk]}}, query)
+            docs = await async_db["anime"].find(in_chunk, projection(fields), collation=collation).to_list(length=None)
+            by_id = {str(d["_id"]): _anime_out(d, fields) for d in docs}
+            items += [by_id[i] for i in chunk if i in by_id]
+        if len(items) >= wanted:
+            break
+    return items[:wanted]
+
+def _demo_insert(add, to_doc, docs: List[dict]) -> dict:
+    """Insert into the demo catalog, reporting results like create_documents_async"""
+    ids, errors = [], []
+    for index, doc in enumerate(docs):
+        _id = str(ObjectId())
+        try:
+            add(to_doc({**doc, "_id": _id}))
+            ids.append(_id)
+        except ValueError as e:
+            ids.append(None)
+            errors.append({"index": index, "error": str(e)})
+    return {"inserted_ids": ids, "errors": errors}
+
+async def _search_anime(q: str, limit: int, cursor: Optional[str], fields: Tuple[str, ...] = ANIME_FIELDS, filt: AnimeFilter = AnimeFilter()):
+    try:
+        offset = decode_offset_cursor(cursor)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    if db is not None and not search_index.ready:
+        # Index still loading: literal (escaped) title match instead of raw user regex
+        query = merge_filters({"title": {"$regex": re.escape(q), "$options": "i"}}, filt.query())
+        docs = await async_db["anime"].find(query, projection(fields), collation=TITLE_COLLATION).sort(ANIME_SORT).skip(offset).limit(limit + 1).to_list(length=None)
+        items = [_anime_out(x, fields) for x in docs]
+    elif snapshot_catalog is not None and not search_index.ready:
+        needle = title_key(q)
+        match = filt.predicate() or (lambda a: True)
+        matches = (a for a in snapshot_catalog.all_anime() if needle in title_key(a.get("title")) and match(a))
+        items = list(islice(matches, offset, offset + limit + 1))
+    elif filt:
+        # the index knows nothing about tags or years: filter the ranking until a page is full
+        items = (await _ranked_anime(search_index.search(q), fields, filt, offset + limit + 1))[offset:]
+    else:
+        ids = search_index.search(q, limit=offset + limit + 1)[offset:]
+        items = await _ranked_anime(ids, fields, filt, limit + 1)
+    next_cursor = encode_offset_cursor(offset + limit) if len(items) > limit else None
+    items = items[:limit]
+    if db is None and fields != ANIME_FIELDS:
+        items = [pick(item, fields) for item in items]
+    return {"items": items, "next_cursor": next_cursor}
+
+# Cached Mongo loaders; writes below invalidate them by tag
+@cached(catalog_cache, tags=lambda limit, cursor, fields=ANIME_FIELDS, filt=None: ["anime:list"])
+async def _fetch_anime_page(limit: int, cursor: Optional[str], fields: Tuple[str, ...] = ANIME_FIELDS, filt: AnimeFilter = AnimeFilter()):
+    query = merge_filters(filt.query(), _cursor_filter("title", cursor))
+    fetched = _with_field(fields, "title")
+    docs = await async_db["anime"].find(query, projection(fetched), collation=TITLE_COLLATION).sort(ANIME_SORT).limit(limit + 1).to_list(length=None)
+    return _page([_anime_out(x, fetched) for x in docs], limit, "title", fields, fetched)
+
+@cached(catalog_cache, tags=lambda anime_id, fields=ANIME_FIELDS: [f"anime:{anime_id}"])
+async def _fetch_anime(anime_id: str, fields: Tuple[str, ...] = ANIME_FIELDS):
+    doc = await async_db["anime"].find_one({"_id": mongo_id(anime_id)}, projection(fields))
+    return _anime_out(doc, fields) if doc else None
+
+@cached(catalog_cache, tags=lambda anime_id, limit, cursor, fields=EPISODE_FIELDS, ep_to=None: [f"episodes:{anime_id}"])
+async def _fetch_episode_page(anime_id: str, limit: int, cursor: Optional[str], fields: Tuple[str, ...] = EPISODE_FIELDS, ep_to: Optional[int] = None):
+    query = {"anime_id": anime_id, **({"number": {"$lte": ep_to}} if ep_to is not None else {})}
+    query = merge_filters(query, _cursor_filter("number", cursor, unique=True))
+    fetched = _with_field(fields, "number")
+    docs = await async_db["episode"].find(query, projection(fetched)).sort(EPISODE_SORT).limit(limit + 1).to_list(length=None)
+    return _page([_episode_out(x, fetched) for x in docs], limit, "number", fields, fetched)
+
+def _anime_written(*anime_ids: str):
+    scopes = [f"anime:{anime_id}" for anime_id in anime_ids]
+    # invalidate before bumping: in between, another worker could otherwise
+    # cache pre-write data in the shared cache for the new version
+    catalog_cache.invalidate_tag(*scopes, "anime:list")
+    catalog_versions.bump("anime", *scopes)
+
+def _episode_written(anime_id: str):
+    catalog_cache.invalidate_tag(f"episodes:{anime_id}")
+    catalog_versions.bump(f"episodes:{anime_id}")
+
+def _not_modified(request: Request, response: Response, *scopes: str) -> Optional[Response]:
+    """ETag from the scopes' versions and the query string; a 304 if the client is current"""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return conditional_get(request, response, catalog_versions.etag(*scopes, params=params))
+
 # Endpoints
-@app.get("/api/anime", response_model=List[AnimeOut])
-def list_anime(q: Optional[str] = None):
-    # Fallback to demo data when DB is not configured
-    if db is None:
-        build_demo_data()
-        items = DEMO_ANIME
+@app.get("/api/anime", response_model=AnimePage)
+async def list_anime(
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated AnimeOut fields to return (id is always included)"),
+    tags: List[str] = Query([], description="Tags to filter by, repeated or comma separated"),
+    tag_mode: str = Query("all", description="'all' requires every tag, 'any' at least one"),
+    year_from: Optional[int] = Query(None, ge=0),
+    year_to: Optional[int] = Query(None, ge=0),
+):
+    selected = _select_fields(fields, ANIME_FIELDS)
+    filt = _anime_filter(tags, tag_mode, year_from, year_to)
+    not_modified = _not_modified(request, response, "anime")
+    if not_modified:
+        return not_modified
+
+    async def build():
+        # Text queries are answered from the search index, ranked by relevance
         if q:
-            items = [a for a in items if q.lower() in a["title"].lower()]
-        items = sorted(items, key=lambda x: x.get("title", ""))
-        return items
-    query = {"title": {"$regex": q, "$options": "i"}} if q else {}
-    items = list(db["anime"].find(query).sort("title"))
-    return [serialize_doc(x) for x in items]
+            return await _search_anime(q, limit, cursor, selected, filt)
+        # Fallback to demo data when DB is not configured
+        if db is None:
+            items = local_catalog.page_anime(limit + 1, _cursor_position(cursor), filt.predicate())
+            return _page(items, limit, "title", selected, ANIME_FIELDS)
+        return await _fetch_anime_page(limit, cursor, selected, filt)
+
+    return await encoded_response(request, response, build)
 
 @app.post("/api/anime", response_model=str)
-def create_anime(payload: Anime):
+async def create_anime(payload: Anime):
+    _check_writable()
     if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
-    _id = create_document("anime", payload)
+        _id = str(ObjectId())
+        demo_catalog.add_anime(_anime_out({**payload.model_dump(), "_id": _id}))
+    else:
+        _id = await create_document_async("anime", payload)
+    search_index.add(_id, payload.model_dump())
+    typeahead.add(_id, payload.title)
+    _anime_written(_id)
     return _id
 
-@app.get("/api/anime/{anime_id}", response_model=AnimeOut)
-def get_anime(anime_id: str):
+class BulkResult(BaseModel):
+    inserted: int
+    failed: int
+    ids: List[dict]
+    errors: List[dict]
+
+@app.post("/api/anime/bulk", response_model=BulkResult)
+async def create_anime_bulk(request: Request):
+    """Insert many anime from a JSON array or an NDJSON stream"""
+    _check_writable()
+    async def write(docs: List[dict]):
+        if db is None:
+            result = _demo_insert(demo_catalog.add_anime, _anime_out, docs)
+        else:
+            result = await create_documents_async("anime", docs)
+        written = []
+        for doc, _id in zip(docs, result["inserted_ids"]):
+            if _id is not None:
+                search_index.add(_id, doc)
+                typeahead.add(_id, doc.get("title"))
+                written.append(_id)
+        # one version bump and one invalidation per chunk
+        if written:
+            _anime_written(*written)
+        return result
+
+    try:
+        return await bulk_ingest(iter_request_items(request), lambda raw: Anime.model_validate(raw).model_dump(), write)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+# Batch lookups: one $in query per collection instead of one request per tile
+BATCH_MAX_IDS = 100
+
+class AnimeBatch(BaseModel):
+    items: List[AnimeOut]
+    missing: List[str]
+
+class EpisodeGroup(BaseModel):
+    items: List[EpisodeOut]
+    next_cursor: Optional[str] = None
+
+def _batch_ids(ids: List[str]) -> List[str]:
+    """Accept repeated and comma separated ids, de-duplicated in request order"""
+    parsed = list(dict.fromkeys(i.strip() for raw in ids for i in raw.split(",") if i.strip()))
+    if not parsed:
+        raise HTTPException(400, "No ids given")
+    if len(parsed) > BATCH_MAX_IDS:
+        raise HTTPException(400, f"At most {BATCH_MAX_IDS} ids per request")
+    return parsed
+
+async def _anime_by_ids(anime_ids: List[str]) -> Dict[str, dict]:
+    """Existing anime among the ids, keyed by id, with one $in query"""
     if db is None:
-        build_demo_data()
-        found = next((a for a in DEMO_ANIME if a["id"] == anime_id), None)
+        return {i: a for i, a in zip(anime_ids, map(local_catalog.get_anime, anime_ids)) if a}
+    query = {"_id": {"$in": [mongo_id(i) for i in anime_ids]}}
+    docs = await async_db["anime"].find(query, ANIME_PROJECTION).to_list(length=None)
+    return {str(d["_id"]): _anime_out(d) for d in docs}
+
+def _group_episodes(anime_ids: List[str], episodes: List[dict], limit: int) -> dict:
+    """Group number-sorted episodes by anime; lists longer than limit get a cursor for list_episodes"""
+    groups = {aid: {"items": [], "next_cursor": None} for aid in anime_ids}
+    for ep in episodes:
+        group = groups.get(ep["anime_id"])
+        if group is None or group["next_cursor"]:
+            continue
+        if len(group["items"]) < limit:
+            group["items"].append(ep)
+        else:
+            last = group["items"][-1]
+            group["next_cursor"] = encode_cursor(last["number"], last["id"])
+    return groups
+
+@app.get("/api/anime/batch", response_model=AnimeBatch)
+async def get_anime_batch(ids: List[str] = Query([])):
+    """Many anime by id (ObjectId or demo string ids), in request order"""
+    anime_ids = _batch_ids(ids)
+    by_id = await _anime_by_ids(anime_ids)
+    return json_response({
+        "items": [by_id[i] for i in anime_ids if i in by_id],
+        "missing": [i for i in anime_ids if i not in by_id],
+    })
+
+@app.get("/api/episodes/batch", response_model=Dict[str, EpisodeGroup])
+async def list_episodes_batch(
+    anime_ids: List[str] = Query([]),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Episodes for many anime grouped by anime id; each group holds at most limit episodes"""
+    ids = _batch_ids(anime_ids)
+    if db is None:
+        episodes = [e for aid in ids for e in local_catalog.page_episodes(aid, limit + 1)]
+    else:
+        # one round trip, but only limit + 1 episodes per anime leave the server
+        pipeline = [
+            {"$match": {"anime_id": {"$in": ids}}},
+            {"$sort": {"anime_id": 1, **dict(EPISODE_SORT)}},
+            {"$project": EPISODE_PROJECTION},
+            {"$group": {"_id": "$anime_id", "episodes": {"$push": "$$ROOT"}}},
+            {"$project": {"episodes": {"$slice": ["$episodes", limit + 1]}}},
+        ]
+        groups = await async_db["episode"].aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+        episodes = [_episode_out(d) for group in groups for d in group["episodes"]]
+    return json_response(_group_episodes(ids, episodes, limit))
+
+@cached(catalog_cache, tags=lambda filt, tag_limit: ["anime:list"])
+async def _fetch_facets(filt: AnimeFilter, tag_limit: int):
+    # always collated: the $group on tags merges case variants even without a tag filter
+    docs = await async_db["anime"].aggregate(facet_pipeline(filt.query(), tag_limit), collation=TITLE_COLLATION).to_list(length=None)
+    return facet_result(docs[0] if docs else {})
+
+async def _ranked_page(ranking, limit: int) -> dict:
+    """Up to limit anime of a popularity ranking, skipping ids with no anime"""
+    ranked = ranking.top()
+    items = []
+    # limit ids per $in query; more only when some of them no longer exist
+    for start in range(0, len(ranked), limit):
+        chunk = ranked[start:start + limit]
+        by_id = await _anime_by_ids([anime_id for anime_id, _ in chunk])
+        for anime_id, score in chunk:
+            if anime_id in by_id:
+                items.append({**by_id[anime_id], "score": round(score, 3)})
+        if len(items) >= limit:
+            break
+    return {"items": items[:limit]}
+
+# Rankings change with every view, so these are served from memory without ETags.
+# Declared (like facets) before /api/anime/{anime_id} so the names are not taken for ids
+@app.get("/api/anime/trending", response_model=RankedPage)
+async def trending_anime(limit: int = Query(20, ge=1, le=TRENDING_SIZE)):
+    """Most viewed anime with exponential time decay; score is in decayed views"""
+    return json_response(await _ranked_page(trending, limit))
+
+@app.get("/api/anime/most-watched", response_model=RankedPage)
+async def most_watched_anime(limit: int = Query(20, ge=1, le=TRENDING_SIZE)):
+    """Anime with the most views of all time; score is the view count"""
+    return json_response(await _ranked_page(most_watched, limit))
+
+@app.get("/api/anime/autocomplete", response_model=TitleSuggestions)
+async def autocomplete_anime(q: str = "", limit: int = Query(TYPEAHEAD_LIMIT, ge=1, le=50)):
+    """Titles starting with q, then titles with a word starting with q (per-keystroke typeahead)"""
+    return json_response({"items": typeahead.complete(q, limit)})
+
+@app.get("/api/anime/facets", response_model=AnimeFacets)
+async def anime_facets(
+    request: Request,
+    response: Response,
+    tags: List[str] = Query([], description="Tags to filter by, repeated or comma separated"),
+    tag_mode: str = Query("all", description="'all' requires every tag, 'any' at least one"),
+    year_from: Optional[int] = Query(None, ge=0),
+    year_to: Optional[int] = Query(None, ge=0),
+    tag_limit: int = Query(FACET_TAG_LIMIT, ge=1, le=500),
+):
+    """Anime count per tag (most frequent first) and per year for the same filters as /api/anime"""
+    filt = _anime_filter(tags, tag_mode, year_from, year_to)
+    not_modified = _not_modified(request, response, "anime")
+    if not_modified:
+        return not_modified
+
+    async def build():
+        if db is None:
+            match = filt.predicate()
+            docs = local_catalog.all_anime()
+            return facet_counts(docs if match is None else filter(match, docs), tag_limit)
+        return await _fetch_facets(filt, tag_limit)
+
+    return await encoded_response(request, response, build)
+
+@app.get("/api/anime/{anime_id}", response_model=AnimeOut)
+async def get_anime(
+    anime_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma separated AnimeOut fields to return (id is always included)"),
+):
+    selected = _select_fields(fields, ANIME_FIELDS)
+    not_modified = _not_modified(request, response, f"anime:{anime_id}")
+    if not_modified:
+        return not_modified
+
+    async def build():
+        found = local_catalog.get_anime(anime_id) if db is None else await _fetch_anime(anime_id, selected)
         if not found:
             raise HTTPException(404, "Anime not found")
-        return found
-    doc = db["anime"].find_one({"_id": ObjectId(anime_id)}) if ObjectId.is_valid(anime_id) else db["anime"].find_one({"_id": anime_id})
-    if not doc:
-        raise HTTPException(404, "Anime not found")
-    return serialize_doc(doc)
+        return pick(found, selected) if db is None and selected != ANIME_FIELDS else found
 
-@app.get("/api/anime/{anime_id}/episodes", response_model=List[EpisodeOut])
-def list_episodes(anime_id: str):
-    if db is None:
-        build_demo_data()
-        items = [e for e in DEMO_EPISODES if e["anime_id"] == anime_id]
-        items = sorted(items, key=lambda x: x.get("number", 0))
-        return items
-    items = list(db["episode"].find({"anime_id": anime_id}).sort("number"))
-    return [serialize_doc(x) for x in items]
+    return await encoded_response(request, response, build)
+
+class AnimeDetail(AnimeOut):
+    episodes: List[EpisodeOut]
+    episodes_next_cursor: Optional[str] = Field(
+        None, description="More episodes in the range: pass to list_episodes together with the same ep_to"
+    )
+
+def _episode_range(ep_from: int, ep_to: Optional[int]) -> dict:
+    return {"$gte": ep_from, **({"$lte": ep_to} if ep_to is not None else {})}
+
+@cached(catalog_cache, tags=lambda anime_id, ep_from, ep_to, limit: [f"anime:{anime_id}", f"episodes:{anime_id}"])
+async def _fetch_anime_detail(anime_id: str, ep_from: int, ep_to: Optional[int], limit: int):
+    # Episodes store anime_id as a string, so join on the stringified _id
+    pipeline = [
+        {"$match": {"_id": mongo_id(anime_id)}},
+        {"$project": ANIME_PROJECTION},
+        {"$lookup": {
+            "from": "episode",
+            "let": {"aid": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$anime_id", "$$aid"]}, "number": _episode_range(ep_from, ep_to)}},
+                {"$sort": dict(EPISODE_SORT)},
+                {"$limit": limit + 1},
+                {"$project": EPISODE_PROJECTION},
+            ],
+            "as": "episodes",
+        }},
+    ]
+    docs = await async_db["anime"].aggregate(pipeline).to_list(length=1)
+    if not docs:
+        return None
+    detail = _anime_out(docs[0])
+    episodes, next_cursor = page_items([_episode_out(e) for e in docs[0]["episodes"]], limit, "number")
+    detail["episodes"] = episodes
+    detail["episodes_next_cursor"] = next_cursor
+    return detail
+
+@app.get("/api/anime/{anime_id}/detail", response_model=AnimeDetail)
+async def get_anime_detail(
+    anime_id: str,
+    request: Request,
+    response: Response,
+    ep_from: int = Query(1, ge=1),
+    ep_to: Optional[int] = Query(None, ge=1),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Anime with its sorted episodes (optionally a number range) in one aggregation"""
+    not_modified = _not_modified(request, response, f"anime:{anime_id}", f"episodes:{anime_id}")
+    if not_modified:
+        return not_modified
+
+    async def build():
+        if db is None:
+            found = local_catalog.get_anime(anime_id)
+            if not found:
+                raise HTTPException(404, "Anime not found")
+            episodes = local_catalog.page_episodes(anime_id, limit + 1, after_number=ep_from - 1, up_to_number=ep_to)
+            episodes, next_cursor = page_items(episodes, limit, "number")
+            return {**found, "episodes": episodes, "episodes_next_cursor": next_cursor}
+        detail = await _fetch_anime_detail(anime_id, ep_from, ep_to, limit)
+        if not detail:
+            raise HTTPException(404, "Anime not found")
+        return detail
+
+    return await encoded_response(request, response, build)
+
+@app.get("/api/anime/{anime_id}/episodes", response_model=EpisodePage)
+async def list_episodes(
+    anime_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated EpisodeOut fields to return (id is always included)"),
+    ep_to: Optional[int] = Query(None, ge=1, description="Last episode number; continues an anime detail episode range"),
+):
+    selected = _select_fields(fields, EPISODE_FIELDS)
+    not_modified = _not_modified(request, response, f"episodes:{anime_id}")
+    if not_modified:
+        return not_modified
+
+    async def build():
+        if db is None:
+            after = _cursor_position(cursor, int)
+            items = local_catalog.page_episodes(anime_id, limit + 1, after[0] if after else None, ep_to)
+            return _page(items, limit, "number", selected, EPISODE_FIELDS)
+        return await _fetch_episode_page(anime_id, limit, cursor, selected, ep_to)
+
+    return await encoded_response(request, response, build)
 
 @app.post("/api/anime/{anime_id}/episodes", response_model=str)
-def create_episode(anime_id: str, payload: Episode):
-    if db is None:
-        raise HTTPException(status_code=500, detail="Database not configured")
+async def create_episode(anime_id: str, payload: Episode):
+    _check_writable()
     data = payload.model_dump()
     data["anime_id"] = anime_id
-    _id = create_document("episode", data)
+    if db is None:
+        _id = str(ObjectId())
+        try:
+            demo_catalog.add_episode(_episode_out({**data, "_id": _id}))
+        except ValueError as e:
+            raise HTTPException(409, str(e))
+    else:
+        try:
+            _id = await create_document_async("episode", data)
+        except DuplicateKeyError:
+            raise HTTPException(409, f"Episode {data['number']} already exists")
+    _episode_written(anime_id)
     return _id
 
+@app.post("/api/anime/{anime_id}/episodes/bulk", response_model=BulkResult)
+async def create_episodes_bulk(anime_id: str, request: Request):
+    """Insert many episodes of one anime from a JSON array or an NDJSON stream"""
+    _check_writable()
+
+    def validate(raw):
+        if isinstance(raw, dict):
+            raw = {**raw, "anime_id": anime_id}
+        return Episode.model_validate(raw).model_dump()
+
+    async def write(docs: List[dict]):
+        if db is None:
+            result = _demo_insert(demo_catalog.add_episode, _episode_out, docs)
+        else:
+            result = await create_documents_async("episode", docs)
+        _episode_written(anime_id)
+        return result
+
+    try:
+        return await bulk_ingest(iter_request_items(request), validate, write)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.post("/api/events", status_code=202)
+async def record_event(event: ViewEvent):
+    """Queue a play or view event; it is written to Mongo in the next batch (never blocks)"""
+    # Demo and snapshot modes keep no event log and only rank views in memory
+    if db is not None:
+        event_buffer.enqueue("view_event", event.model_dump())
+    record_view(event.anime_id, event.episode_id if event.type == "play" else None, persist=db is not None)
+    return {"accepted": True}
+
+# Write out buffered events and view counts before the process exits
+@app.on_event("shutdown")
+async def flush_events():
+    await asyncio.to_thread(event_buffer.close)
+    if db is not None:
+        try:
+            await view_counters.flush(async_db)
+        except Exception:
+            pass
+
+# Lines per chunk written to the export stream
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+EXPORT_TYPES = ("anime", "episode")
+
+async def _export_docs(kind: str):
+    """Response-shaped documents of one collection, streamed in _id order from Mongo"""
+    if db is None:
+        docs = local_catalog.all_anime() if kind == "anime" else local_catalog.all_episodes()
+        for doc in docs:
+            yield doc
+        return
+    out, fields = (_anime_out, ANIME_PROJECTION) if kind == "anime" else (_episode_out, EPISODE_PROJECTION)
+    async for doc in iter_documents_async(kind, projection=fields, sort=[("_id", 1)]):
+        yield out(doc)
+
+async def _export_lines(kinds: List[str]):
+    # StreamingResponse cancels this generator when the client disconnects;
+    # the cursor is closed as the cancellation unwinds iter_documents_async
+    for kind in kinds:
+        chunk = []
+        async for doc in _export_docs(kind):
+            chunk.append(dumps({"type": kind, **doc}))
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+                # in-memory catalogs never await; give the disconnect listener a turn
+                await asyncio.sleep(0)
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+@app.get("/api/export")
+async def export_catalog(types: List[str] = Query([], description="anime and/or episode (default both)")):
+    """The whole catalog as NDJSON, one {"type": ..., <fields>} object per line, in constant memory"""
+    kinds = [t for raw in types for t in raw.split(",") if t] or list(EXPORT_TYPES)
+    unknown = [t for t in kinds if t not in EXPORT_TYPES]
+    if unknown:
+        raise HTTPException(400, f"Unknown export type: {', '.join(unknown)}")
+    return StreamingResponse(
+        _export_lines(list(dict.fromkeys(kinds))),
+        media_type="application/x-ndjson",
+        headers={"content-disposition": 'attachment; filename="catalog.ndjson"'},
+    )
+
+@app.get("/api/diagnostics/query-plans")
+def query_plans():
+    """explain() each endpoint query and flag COLLSCAN / in-memory SORT stages"""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not configured")
+    return explain_queries(db)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/test")
 def test_database():
     response = {
@@ -327,13 +1118,26 @@ def test_database():
 
     response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
     response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
-    if db is None:
+    if snapshot_catalog is not None:
+        response["snapshot"] = {
+            "path": CATALOG_SNAPSHOT,
+            "version": snapshot_catalog.version,
+            "anime": snapshot_catalog.anime_count,
+            "episodes": snapshot_catalog.episode_count,
+        }
+    elif db is None:
         response["demo_data"] = True
         response["demo_counts"] = {
-            "anime": len(DEMO_ANIME),
-            "episodes": len(DEMO_EPISODES)
+            "anime": demo_catalog.anime_count,
+            "episodes": demo_catalog.episode_count
         }
         response["external_source"] = HIANIME_URL
+    response["cache"] = catalog_cache.stats()
+    response["body_cache"] = body_cache.stats()
+    response["coalescing"] = catalog_flight.stats()
+    response["events"] = event_buffer.stats()
+    response["view_counters"] = view_counters.stats()
+    response["admission"] = admission.stats()
     return response
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+"""
+Prometheus Metrics
+
+Low-overhead request and MongoDB metrics exposed in the Prometheus text
+format at /metrics:
+- http_request_duration_seconds{route,method}  latency per route template
+- http_response_size_bytes{route,method}       response body sizes
+- http_requests_in_flight                      requests currently being served
+- mongodb_command_duration_seconds{collection,command}
+- mongodb_pool_checkout_wait_seconds           connection pool checkout wait
+
+Values live in per-thread shards (plain lists) that are only summed when
+/metrics is scraped, so recording takes no locks. Label children are
+resolved once per route / Mongo command and cached, so the hot path builds
+no label tuples or dicts.
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class _Shards:
+    """Per-thread value arrays, summed at scrape time"""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._all: List[list] = []
+        self._lock = threading.Lock()
+
+    def values(self) -> list:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0] * self._size
+            with self._lock:
+                self._all.append(values)
+            self._local.values = values
+            return values
+
+    def snapshot(self) -> list:
+        total = [0] * self._size
+        with self._lock:
+            shards = list(self._all)
+        for values in shards:
+            for i, v in enumerate(values):
+                total[i] += v
+        return total
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_shards")
+
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        # one slot per bucket, one for +Inf, one for the running sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value: float):
+        values = self._shards.values()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        values = self._shards.snapshot()
+        return values[:-1], values[-1]
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children: Dict[tuple, _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _HistogramChild:
+        """Child for the label values; resolve once and keep the result on hot paths"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, label_values))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._shards = _Shards(1)
+
+    def inc(self):
+        self._shards.values()[0] += 1
+
+    def dec(self):
+        self._shards.values()[0] -= 1
+
+    def expose(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self._shards.snapshot()[0]}",
+        ]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("route", "method"))
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size by route template", ("route", "method"), SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being processed")
+MONGO_LATENCY = Histogram("mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command"))
+POOL_WAIT = Histogram("mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled MongoDB connection")
+ADMISSION_QUEUED = Gauge("http_requests_queued", "HTTP requests waiting for admission")
+ADMISSION_WAIT = Histogram("http_admission_wait_seconds", "Time queued requests waited for admission (admitted or shed)")
+
+METRICS = [REQUEST_LATENCY, RESPONSE_SIZE, IN_FLIGHT, MONGO_LATENCY, POOL_WAIT, ADMISSION_QUEUED, ADMISSION_WAIT]
+
+def render() -> bytes:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines += metric.expose()
+    return ("\n".join(lines) + "\n").encode()
+
+# Response appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, response size and in-flight requests per route"""
+
+    def __init__(self, app):
+        self.app = app
+        # keyed by id(route): routes define __eq__ and are not hashable
+        self._route_children: Dict[int, Tuple[_HistogramChild, _HistogramChild]] = {}
+        self._unmatched = (REQUEST_LATENCY.labels("<unmatched>", ""), RESPONSE_SIZE.labels("<unmatched>", ""))
+
+    def _children(self, route) -> Tuple[_HistogramChild, _HistogramChild]:
+        if route is None:
+            return self._unmatched
+        children = self._route_children.get(id(route))
+        if children is None:
+            method = ",".join(sorted(getattr(route, "methods", None) or ()))
+            path = getattr(route, "path", "<unknown>")
+            children = (REQUEST_LATENCY.labels(path, method), RESPONSE_SIZE.labels(path, method))
+            self._route_children[id(route)] = children
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        IN_FLIGHT.inc()
+        size = 0
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal size
+            if message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # the router stores the matched route in the (shared) scope
+            latency, sizes = self._children(scope.get("route"))
+            latency.observe(time.perf_counter() - start)
+            sizes.observe(size)
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Per collection/command latency from pymongo command monitoring"""
+
+    def __init__(self):
+        self._pending: Dict[int, str] = {}
+        self._children: Dict[Tuple[str, str], _HistogramChild] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # getMore carries the cursor id there and the collection under "collection"
+            collection = event.command.get("collection")
+        self._pending[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _observe(self, event):
+        collection = self._pending.pop(event.request_id, "")
+        key = (collection, event.command_name)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children.setdefault(key, MONGO_LATENCY.labels(*key))
+        child.observe(event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        self._observe(event)
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Connection checkout wait: check_out_started -> checked_out on the same thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._child = POOL_WAIT.labels()
+
+    def connection_check_out_started(self, event):
+        self._local.start = time.perf_counter()
+
+    def _observe(self):
+        start: Optional[float] = getattr(self._local, "start", None)
+        if start is not None:
+            self._child.observe(time.perf_counter() - start)
+            self._local.start = None
+
+    def connection_checked_out(self, event):
+        self._observe()
+
+    def connection_check_out_failed(self, event):
+        self._observe()
+
+    # remaining pool events are not needed
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_checked_in(self, event): pass
+
+def mongo_listeners() -> list:
+    return [MongoCommandListener(), MongoPoolListener()]
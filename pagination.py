@@ -0,0 +1,85 @@
+"""
+Keyset Pagination Helpers
+
+Opaque cursor pagination for sorted collections. Pages are keyed on
+(sort field, _id) so ordering stays stable while new documents are inserted:
+the next page always starts strictly after the last item already returned.
+"""
+
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+
+from bson import ObjectId
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(value: Any, doc_id: Any) -> str:
+    """Encode the sort key of the last returned item as an opaque cursor"""
+    raw = json.dumps([value, str(doc_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed.
+
+    Sort keys are titles or numbers; anything else (such as a {"$regex": ...}
+    object) is rejected because the value goes into a Mongo filter.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(doc_id, str) or not isinstance(value, (str, int)) or isinstance(value, bool):
+        raise ValueError("Invalid cursor")
+    return value, doc_id
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for relevance ranked results, which have no stable sort key"""
+    return encode_cursor(offset, "offset")
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    offset, kind = decode_cursor(cursor)
+    if kind != "offset" or not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def mongo_id(doc_id: str):
+    """ObjectId for valid hex ids, the raw string otherwise (matches get_anime lookups)"""
+    return ObjectId(doc_id) if ObjectId.is_valid(doc_id) else doc_id
+
+def keyset_filter(field: str, cursor: Optional[str], unique: bool = False) -> dict:
+    """Mongo filter selecting documents strictly after the cursor position.
+
+    When field is unique within the query (e.g. episode numbers per anime) the
+    _id tie-breaker is dropped so the filter stays a single index range.
+    """
+    if not cursor:
+        return {}
+    value, doc_id = decode_cursor(cursor)
+    if unique:
+        return {field: {"$gt": value}}
+    return {"$or": [
+        {field: {"$gt": value}},
+        {field: value, "_id": {"$gt": mongo_id(doc_id)}},
+    ]}
+
+def merge_filters(*filters: dict) -> dict:
+    """AND together the non-empty filters"""
+    parts = [f for f in filters if f]
+    if not parts:
+        return {}
+    if len(parts) == 1:
+        return parts[0]
+    return {"$and": parts}
+
+def page_items(items: List[dict], limit: int, field: str, id_field: str = "id") -> Tuple[List[dict], Optional[str]]:
+    """Trim a limit+1 fetch to one page and build the next cursor"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.get(field), last.get(id_field))
@@ -0,0 +1,168 @@
+"""
+View Counters and Trending
+
+Plays and page views are counted in memory and written periodically as
+one unordered bulk_write of $inc updates per collection, so a hot title
+costs one update per flush instead of one per view. Anime and episodes
+get a `view_count` field.
+
+Rankings are kept in memory and updated on every view, so serving them is
+O(k) with no aggregation:
+
+- trending: views with exponential time decay (TRENDING_HALF_LIFE), per
+  process. With several workers each one ranks the share of traffic it
+  sees, which for popular titles gives the same order.
+- most watched: all-time view_count. With a database it is replaced after
+  every flush by an indexed top-k query, so all workers agree; in demo and
+  snapshot modes it counts the views since startup.
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+
+from pagination import mongo_id
+
+POPULARITY_FLUSH_INTERVAL = float(os.getenv("POPULARITY_FLUSH_INTERVAL", 5))
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE", 6 * 3600))
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", 100))
+# Scores kept for titles outside the top; halved (lowest dropped) when exceeded
+TRENDING_MAX_TRACKED = int(os.getenv("TRENDING_MAX_TRACKED", 200_000))
+
+class DecayedTopK:
+    """The k keys with the highest (optionally time-decayed) counts, maintained on every add.
+
+    Decay is applied forward: an add at time t weighs 2 ** ((t - t0) / half_life),
+    so stored scores never have to be decayed in place and their order is
+    the decayed order. Scores are scaled back to "now" when read.
+    """
+
+    def __init__(self, k: int, half_life: Optional[float] = None, max_tracked: int = TRENDING_MAX_TRACKED):
+        self.k = k
+        self.half_life = half_life
+        self.max_tracked = max(max_tracked, 2 * k)
+        self._t0 = time.time()
+        self._scores: Dict[str, float] = {}
+        # the current top k as (score, key), ascending
+        self._top: List[Tuple[float, str]] = []
+        self._in_top = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _weight(self, now: float) -> float:
+        if self.half_life is None:
+            return 1.0
+        exponent = (now - self._t0) / self.half_life
+        if exponent > 64:
+            # keep weights in float range: rescale everything to a new origin
+            factor = 2.0 ** -exponent
+            self._scores = {key: score * factor for key, score in self._scores.items()}
+            self._top = [(score * factor, key) for score, key in self._top]
+            self._t0, exponent = now, 0.0
+        return 2.0 ** exponent
+
+    def add(self, key: str, amount: float = 1.0, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            weight = self._weight(now)
+            old = self._scores.get(key, 0.0)
+            score = self._scores[key] = old + amount * weight
+            if len(self._scores) > self.max_tracked:
+                self._shrink()
+            top = self._top
+            if key in self._in_top:
+                del top[bisect.bisect_left(top, (old, key))]
+            elif len(top) >= self.k:
+                if score <= top[0][0]:
+                    return
+                self._in_top.discard(top.pop(0)[1])
+            bisect.insort(top, (score, key))
+            self._in_top.add(key)
+
+    def _shrink(self):
+        keep = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)[:self.max_tracked // 2]
+        self._scores = dict(keep)
+
+    def top(self, n: Optional[int] = None, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Up to n (key, score) pairs, best first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            scale = 1.0 if self.half_life is None else 2.0 ** -((now - self._t0) / self.half_life)
+            best = self._top if n is None else self._top[-n:] if n > 0 else []
+            return [(key, score * scale) for score, key in reversed(best)]
+
+    def replace(self, counts: Iterable[Tuple[str, float]]):
+        """Reset to the given (undecayed) counts"""
+        with self._lock:
+            self._t0 = time.time()
+            self._scores = dict(counts)
+            self._top = sorted((score, key) for key, score in self._scores.items())[-self.k:]
+            self._in_top = {key for _, key in self._top}
+
+class ViewCounters:
+    """Per-process view increments waiting to be written as bulk $inc updates"""
+
+    def __init__(self, field: str = "view_count"):
+        self.field = field
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.updates = 0
+
+    def add(self, collection_name: str, doc_id: str, amount: int = 1):
+        with self._lock:
+            counts = self._pending.setdefault(collection_name, {})
+            counts[doc_id] = counts.get(doc_id, 0) + amount
+
+    def pending(self) -> int:
+        return sum(len(counts) for counts in self._pending.values())
+
+    async def flush(self, database) -> int:
+        """Write the pending increments, one unordered bulk_write per collection"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        batches = list(pending.items())
+        for i, (collection_name, counts) in enumerate(batches):
+            ops = [UpdateOne({"_id": mongo_id(doc_id)}, {"$inc": {self.field: n}}) for doc_id, n in counts.items()]
+            try:
+                await database[collection_name].bulk_write(ops, ordered=False)
+            except Exception:
+                # put the unwritten counts back for the next flush; $inc is not idempotent,
+                # so a partially applied batch can over-count, never under-count
+                for name, rest in batches[i:]:
+                    for doc_id, n in rest.items():
+                        self.add(name, doc_id, n)
+                raise
+            written += len(ops)
+        self.flushes += 1
+        self.updates += written
+        return written
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), "flushes": self.flushes, "updates": self.updates}
+
+async def top_viewed(database, k: int) -> List[Tuple[str, int]]:
+    """(id, view_count) of the k most viewed anime, from the view_count index"""
+    cursor = database["anime"].find({"view_count": {"$gt": 0}}, {"view_count": 1}).sort("view_count", DESCENDING).limit(k)
+    return [(str(doc["_id"]), doc["view_count"]) async for doc in cursor]
+
+view_counters = ViewCounters()
+trending = DecayedTopK(TRENDING_SIZE, TRENDING_HALF_LIFE)
+most_watched = DecayedTopK(TRENDING_SIZE)
+
+def record_view(anime_id: str, episode_id: Optional[str] = None, persist: bool = True):
+    """Count one view of an anime (and one play of an episode); persist=False only ranks it"""
+    if persist:
+        view_counters.add("anime", anime_id)
+        if episode_id:
+            view_counters.add("episode", episode_id)
+    now = time.time()
+    trending.add(anime_id, now=now)
+    most_watched.add(anime_id, now=now)
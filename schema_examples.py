@@ -6,7 +6,9 @@ Copy and modify these examples for your specific needs.
 """
 
 from datetime import datetime
+from bson import ObjectId
 from database import create_document, get_documents, update_document, delete_document
+from events import BufferFull, event_buffer
 
 # =============================================================================
 # USER MANAGEMENT SCHEMA
@@ -251,8 +253,22 @@ def create_booking(event_id: str, user_id: str, ticket_quantity: int = 1):
 # ANALYTICS/TRACKING SCHEMA
 # =============================================================================
 
+# Longest a tracking call waits for room in a full event buffer before dropping the event
+TRACKING_ENQUEUE_TIMEOUT = 5.0
+
+def _track(collection_name: str, data: dict):
+    """Queue an analytics document; returns its id, or None if it was dropped (buffer full)"""
+    # the id is assigned here because the insert happens later, in the writer thread
+    _id = ObjectId()
+    try:
+        event_buffer.enqueue(collection_name, {**data, "_id": _id}, block=True, timeout=TRACKING_ENQUEUE_TIMEOUT)
+    except BufferFull:
+        # counted in event_buffer.stats()["rejected"]
+        return None
+    return str(_id)
+
 def track_user_activity(user_id: str, action: str, resource_type: str, resource_id: str, metadata: dict = None):
-    """Track user activity for analytics"""
+    """Track user activity for analytics (queued and written in batches)"""
     activity_data = {
         "user_id": user_id,
         "action": action,  # view, create, update, delete, login, etc.
@@ -264,10 +280,10 @@ def track_user_activity(user_id: str, action: str, resource_type: str, resource_
         "session_id": None,
         "timestamp": datetime.utcnow()
     }
-    return create_document("user_activities", activity_data)
+    return _track("user_activities", activity_data)
 
 def track_page_view(page_path: str, user_id: str = None, session_id: str = None):
-    """Track page views for analytics"""
+    """Track page views for analytics (queued and written in batches)"""
     pageview_data = {
         "page_path": page_path,
         "user_id": user_id,
@@ -284,7 +300,7 @@ def track_page_view(page_path: str, user_id: str = None, session_id: str = None)
         },
         "timestamp": datetime.utcnow()
     }
-    return create_document("page_views", pageview_data)
+    return _track("page_views", pageview_data)
 
 # =============================================================================
 # NOTIFICATION SCHEMA
@@ -12,7 +12,7 @@ Model name is converted to lowercase for the collection name:
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 # Example schemas (kept for reference)
 class User(BaseModel):
@@ -63,4 +63,16 @@ class Episode(BaseModel):
     duration: Optional[int] = Field(None, description="Duration in minutes")
     external_url: Optional[str] = Field(None, description="External link to this episode on another site (e.g., HiAnime)")
 
+class ViewEvent(BaseModel):
+    """
+    Playback / page view events, written in batches by events.EventBuffer
+    Collection name: "view_event"
+    """
+    type: Literal["play", "view"] = Field("view", description="play: an episode started, view: a title page was opened")
+    anime_id: str = Field(..., description="Related anime ObjectId as string")
+    episode_id: Optional[str] = Field(None, description="Episode ObjectId as string, for plays")
+    user_id: Optional[str] = Field(None, description="Signed-in user, if any")
+    session_id: Optional[str] = Field(None, description="Client session identifier")
+    position: Optional[int] = Field(None, ge=0, description="Playback position in seconds")
+
 # The Flames database viewer will automatically read these schemas from GET /schema
@@ -0,0 +1,211 @@
+"""
+Full-Text Search Index
+
+In-memory inverted index over anime title, description and tags.
+Queries are tokenized the same way as documents, every query term must
+match (exactly or within one typo) and results are ranked by a field
+weighted TF-IDF score. The index is built once at startup and updated
+incrementally on writes, so lookup cost depends on posting list sizes
+rather than on the size of the catalog.
+"""
+
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "description": 1.0}
+TYPO_PENALTY = 0.6
+MIN_TYPO_LENGTH = 4
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'Pokémon' matches 'pokemon'"""
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize(text))
+
+def _deletes(token: str) -> Set[str]:
+    """All variants of token with one character removed (symmetric delete typo matching)"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insert, delete, substitution or transposition"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+class SearchIndex:
+    """Thread-safe inverted index with typo tolerant, ranked AND queries"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._titles: Dict[str, str] = {}
+        self._delete_map: Dict[str, Set[str]] = defaultdict(set)
+        self._ranked_cache: Dict[str, List[str]] = {}
+        self.ready = False
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, doc_id: str, doc: dict) -> bool:
+        """Index (or re-index) a document; False if it was already indexed as is"""
+        weights: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            value = doc.get(field)
+            if isinstance(value, (list, tuple)):
+                value = " ".join(v for v in value if isinstance(v, str))
+            for token in tokenize(value):
+                weights[token] += weight
+        title = normalize(doc.get("title") or "")
+        with self._lock:
+            terms = self._doc_terms.get(doc_id)
+            if terms is not None:
+                if (terms == weights.keys() and self._titles.get(doc_id) == title
+                        and all(self._postings[token].get(doc_id) == weight for token, weight in weights.items())):
+                    return False
+                self._remove_locked(doc_id)
+            for token, weight in weights.items():
+                postings = self._postings[token]
+                if not postings and len(token) >= MIN_TYPO_LENGTH:
+                    for variant in _deletes(token):
+                        self._delete_map[variant].add(token)
+                postings[doc_id] = weight
+                self._ranked_cache.pop(token, None)
+            self._doc_terms[doc_id] = set(weights)
+            self._titles[doc_id] = title
+            return True
+
+    def swap(self, other: "SearchIndex"):
+        """Take over the contents of an index built off to the side"""
+        with self._lock:
+            self._postings, self._doc_terms, self._titles = other._postings, other._doc_terms, other._titles
+            self._delete_map, self._ranked_cache = other._delete_map, other._ranked_cache
+            self.ready = True
+
+    def add_many(self, docs: Iterable[Tuple[str, dict]]):
+        for doc_id, doc in docs:
+            self.add(doc_id, doc)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str):
+        for token in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            self._ranked_cache.pop(token, None)
+            if not postings:
+                del self._postings[token]
+                for variant in _deletes(token):
+                    tokens = self._delete_map.get(variant)
+                    if tokens:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._delete_map[variant]
+        self._titles.pop(doc_id, None)
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Vocabulary tokens matching term, with the factor applied to their score"""
+        matches = {term: 1.0} if term in self._postings else {}
+        if len(term) < MIN_TYPO_LENGTH:
+            return matches
+        candidates = set(self._delete_map.get(term, ()))
+        for variant in _deletes(term):
+            if variant in self._postings:
+                candidates.add(variant)
+            candidates.update(self._delete_map.get(variant, ()))
+        for token in candidates:
+            if token != term and token in self._postings and _within_one_edit(term, token):
+                matches[token] = TYPO_PENALTY
+        return matches
+
+    def _ranked_postings(self, token: str) -> List[str]:
+        """Posting list of token sorted by rank, cached until the token changes"""
+        ranked = self._ranked_cache.get(token)
+        if ranked is None:
+            postings = self._postings[token]
+            ranked = sorted(postings, key=lambda d: (-postings[d], self._titles.get(d, ""), d))
+            self._ranked_cache[token] = ranked
+        return ranked
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Ranked ids of documents matching every term in query"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            total = max(len(self._doc_terms), 1)
+            expansions = [self._expand(term) for term in terms]
+            if not all(expansions):
+                return []
+
+            # Single term without typo variants: the cached ranked posting list is the answer
+            if len(expansions) == 1 and len(expansions[0]) == 1:
+                ranked_ids = self._ranked_postings(next(iter(expansions[0])))
+                return ranked_ids[:limit] if limit is not None else list(ranked_ids)
+
+            sources: List[List[Tuple[Dict[str, float], float]]] = [
+                [
+                    (self._postings[token], math.log(1 + total / len(self._postings[token])) * factor)
+                    for token, factor in expanded.items()
+                ]
+                for expanded in expansions
+            ]
+
+            # Drive the AND from the term with the fewest candidate documents
+            sources.sort(key=lambda srcs: sum(len(p) for p, _ in srcs))
+            ranked: Dict[str, float] = {}
+            for postings, mult in sources[0]:
+                for doc_id, weight in postings.items():
+                    score = weight * mult
+                    if score > ranked.get(doc_id, 0.0):
+                        ranked[doc_id] = score
+            for srcs in sources[1:]:
+                survivors: Dict[str, float] = {}
+                for doc_id, score in ranked.items():
+                    best = 0.0
+                    for postings, mult in srcs:
+                        weight = postings.get(doc_id)
+                        if weight is not None and weight * mult > best:
+                            best = weight * mult
+                    if best:
+                        survivors[doc_id] = score + best
+                ranked = survivors
+                if not ranked:
+                    return []
+
+            titles = self._titles
+            key = lambda d: (-ranked[d], titles.get(d, ""), d)
+            if limit is not None:
+                return heapq.nsmallest(limit, ranked, key=key)
+            return sorted(ranked, key=key)
+
+# Process-wide index used by the API
+search_index = SearchIndex()
@@ -0,0 +1,69 @@
+"""
+Fast Response Serialization
+
+Single-pass conversion of trusted Mongo documents into response dicts and
+direct-to-bytes JSON encoding with orjson. Endpoints that return these
+responses skip FastAPI's response_model revalidation, which would otherwise
+re-check every item that already came out of our own database.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+
+def output_fields(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """Response fields of a model other than the synthetic id"""
+    return tuple(name for name in model.model_fields if name != "id")
+
+def output_defaults(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Values a missing field would get if the model validated the document"""
+    defaults = {}
+    for name, field in model.model_fields.items():
+        defaults[name] = field.get_default(call_default_factory=True) if not field.is_required() else None
+    return defaults
+
+def projection(fields: Iterable[str]) -> Dict[str, int]:
+    """Mongo projection fetching only the given fields (and _id)"""
+    return {"_id": 1, **{name: 1 for name in fields}}
+
+def to_out(doc: dict, fields: Tuple[str, ...], defaults: Dict[str, Any]) -> dict:
+    """Build the response dict for one document in a single pass"""
+    _id = doc.get("_id", doc.get("id"))
+    out = {"id": str(_id) if _id is not None else None}
+    for name in fields:
+        value = doc.get(name, defaults.get(name))
+        out[name] = str(value) if isinstance(value, ObjectId) else value
+    return out
+
+def parse_fields(raw: str, allowed: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Fields named in a comma separated fields= value, in model order.
+
+    "id" is accepted but always returned anyway; unknown names raise ValueError.
+    """
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = requested - set(allowed) - {"id"}
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}; allowed: id, {', '.join(allowed)}")
+    return tuple(name for name in allowed if name in requested)
+
+def pick(item: dict, fields: Tuple[str, ...]) -> dict:
+    """A response dict trimmed to id and the given fields"""
+    return {"id": item.get("id"), **{name: item.get(name) for name in fields}}
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload, default=_default)
+
+def json_response(payload: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Encoded JSON response carrying the headers already set on the injected response"""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,226 @@
+"""
+Cross-Process Shared State
+
+With several uvicorn workers every process would otherwise keep its own
+version counters and caches, so a write handled by one worker would not
+invalidate the others and each worker would warm its own copy. When
+SHARED_STATE_DIR is set (start_server.sh points it at /dev/shm), workers
+share:
+
+- SharedCounters: a table of 64-bit counters in an mmap'ed file. Names
+  hash into a fixed number of slots; a collision only causes a spurious
+  invalidation. Reads are plain memory loads, bumps take a short flock.
+- SharedCache: an LRUCache-compatible cache whose entries are files in the
+  same (tmpfs) directory, i.e. living in shared memory. Each entry records
+  the counter values of its tags when it was stored; invalidate_tag() just
+  bumps those counters, which invalidates the entry in every worker.
+
+The directory is private (0700) because entries are pickles.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Hashable, Iterable, Optional
+
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR")
+
+_MAGIC = b"ANICNT01"
+_HEADER = struct.Struct("<8sQ")
+COUNTER_SLOTS = 1 << 16
+
+def _digest(value: str, size: int = 8) -> bytes:
+    return hashlib.blake2b(value.encode(), digest_size=size).digest()
+
+class SharedCounters:
+    """Named 64-bit counters shared by every process that opens the same file"""
+
+    def __init__(self, path: str, slots: int = COUNTER_SLOTS):
+        self.path = path
+        size = _HEADER.size + 8 * slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            # the first process sizes the file and stamps the epoch
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, time.time_ns() // 1000), 0)
+        self._mm = mmap.mmap(self._fd, size)
+        magic, epoch = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a counter file")
+        self.epoch = format(epoch, "x")
+        self._slots = memoryview(self._mm)[_HEADER.size:].cast("Q")
+        self._mask = slots - 1
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _slot(self, name: str) -> int:
+        return int.from_bytes(_digest(name), "little") & self._mask
+
+    def get(self, name: str) -> int:
+        return self._slots[self._slot(name)]
+
+    def bump(self, *names: str):
+        slots = {self._slot(name) for name in names}
+        with self._locked():
+            for slot in slots:
+                self._slots[slot] += 1
+
+class SharedCache:
+    """File-per-entry cache in a shared directory with counter-based tag invalidation.
+
+    Eviction is by write time: every so often the writer removes the
+    oldest files beyond maxsize.
+    """
+
+    def __init__(self, directory: str, counters: SharedCounters, maxsize: int = 1024, ttl: Optional[float] = 60.0):
+        self.directory = directory
+        self.counters = counters
+        self.maxsize = maxsize
+        self.ttl = ttl
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self._sweep_every = max(maxsize // 10, 1)
+        self._writes = 0
+        # per-process counters, like LRUCache's
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.discarded = 0
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if not name.startswith("."))
+
+    def _path(self, key: Hashable) -> str:
+        return os.path.join(self.directory, _digest(repr(key), 16).hex())
+
+    def _tag_versions(self, tags: Iterable[str]) -> tuple:
+        return tuple(self.counters.get(f"tag:{tag}") for tag in tags)
+
+    def versions(self, tags: Iterable[str]) -> tuple:
+        """Token for the tags' invalidation state; pass it to set() to store only if none changed"""
+        return self._tag_versions(tags)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, expires_at, tags, versions, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        if stored_key != key:
+            self.misses += 1
+            return default
+        if expires_at is not None and expires_at <= time.time():
+            self.expirations += 1
+            self.misses += 1
+            self._unlink(path)
+            return default
+        if self._tag_versions(tags) != versions:
+            self.misses += 1
+            self._unlink(path)
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = (), versions: Optional[tuple] = None):
+        """Store value; with versions (from versions(tags)), skipped if a tag was invalidated since"""
+        ttl = self.ttl if ttl is None else ttl
+        tags = tuple(tags)
+        current = self._tag_versions(tags)
+        if versions is None:
+            versions = current
+        elif versions != current:
+            self.discarded += 1
+            return
+        # stored with the versions the value was read under, so an invalidation
+        # racing this write still makes get() drop it
+        entry = (key, time.time() + ttl if ttl else None, tags, versions, value)
+        path = self._path(key)
+        tmp = os.path.join(self.directory, f".tmp-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % self._sweep_every == 0:
+            self._sweep()
+
+    def invalidate(self, key: Hashable):
+        if self._unlink(self._path(key)):
+            self.invalidations += 1
+
+    def invalidate_tag(self, *tags: str):
+        """Invalidate every entry carrying any of the tags, in every process"""
+        self.counters.bump(*(f"tag:{tag}" for tag in tags))
+        self.invalidations += len(tags)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._unlink(os.path.join(self.directory, name))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "discarded": self.discarded,
+            "shared": True,
+        }
+
+    def _unlink(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def _sweep(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    entries.append((entry.stat().st_mtime_ns, entry.path))
+                except OSError:
+                    pass
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.maxsize]:
+            if self._unlink(path):
+                self.evictions += 1
+
+def _open_counters() -> Optional[SharedCounters]:
+    if not SHARED_STATE_DIR:
+        return None
+    os.makedirs(SHARED_STATE_DIR, mode=0o700, exist_ok=True)
+    return SharedCounters(os.path.join(SHARED_STATE_DIR, "counters"))
+
+shared_counters = _open_counters()
+
+def shared_cache(name: str, maxsize: int, ttl: Optional[float]) -> Optional[SharedCache]:
+    """A SharedCache under SHARED_STATE_DIR, or None when state is per process"""
+    if shared_counters is None:
+        return None
+    return SharedCache(os.path.join(SHARED_STATE_DIR, name), shared_counters, maxsize, ttl)
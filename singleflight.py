@@ -0,0 +1,108 @@
+"""
+Request Coalescing (single flight)
+
+Concurrent calls with the same key share one execution: the first caller
+starts the work, later callers wait for its result, and everyone gets the
+same value or the same exception. Used by cache.cached, so a burst of
+identical reads that all miss the cache (say, a popular title right after
+release) issues a single Mongo query. cached() includes the invalidation
+state of the entry's tags in the key, so a read that arrives after a write
+never joins a flight that started before it.
+
+Waiters give up after `timeout` seconds with FlightTimeout; the shared
+execution keeps running so callers arriving later still join it instead
+of starting another query against a slow backend.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+COALESCE_TIMEOUT = float(os.getenv("COALESCE_TIMEOUT", 10))
+
+class FlightTimeout(TimeoutError):
+    """Raised to callers that waited longer than the timeout for a shared execution"""
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Deduplicates concurrent executions per key, for coroutines and blocking callables"""
+
+    def __init__(self, timeout: Optional[float] = COALESCE_TIMEOUT):
+        self.timeout = timeout
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Await fn() once per key across concurrent callers (one event loop)"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            # shield: a caller timing out or disconnecting must not cancel the shared work
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise FlightTimeout(f"Timed out after {timeout}s waiting for a shared query")
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        self._tasks.pop(key, None)
+        # mark the exception retrieved even if every waiter timed out
+        if not task.cancelled():
+            task.exception()
+
+    def do_sync(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Call fn() once per key across concurrent threads"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                call.value = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        else:
+            timeout = self.timeout if timeout is None else timeout
+            if not call.done.wait(timeout):
+                self.timeouts += 1
+                raise FlightTimeout(f"Timed out after {timeout}s waiting for a shared query")
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks) + len(self._calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+        }
+
+# Coalesces the read-through loaders in cache.cached
+catalog_flight = SingleFlight()
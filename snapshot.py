@@ -0,0 +1,345 @@
+"""
+Catalog Snapshots
+
+A compact, read-only binary copy of the anime and episode collections for
+edge replicas that serve without a database. The file is mmap'ed, so
+opening it is O(1) whatever the catalog size (only the header is parsed)
+and every worker process shares the same pages through the page cache.
+
+Layout (little endian, sections 8-byte aligned):
+    magic "ANISNAP1" | format u32 | header length u32 | header JSON
+    anime_offsets    Q[anime_count + 1]  record byte ranges, in title order
+    anime_hashes     Q[anime_count]      sorted 64-bit id hashes
+    anime_positions  I[anime_count]      title position of each hash
+    episode_offsets  Q[episode_count + 1] records grouped by anime, by number
+    episode_numbers  q[episode_count]
+    group_hashes     Q[group_count]      sorted 64-bit anime_id hashes
+    group_bounds     I[2 * group_count]  [start, end) episode range per anime
+    records          orjson documents, already in response shape
+
+Snapshots are written to a temporary file and renamed into place, and
+SnapshotCatalog re-opens the path when the file changes, so a new snapshot
+is hot-swapped atomically without a restart.
+
+Export from the configured database:
+    python snapshot.py export catalog.snap
+    python snapshot.py info catalog.snap
+"""
+
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from catalog import title_key
+
+MAGIC = b"ANISNAP1"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+
+SECTIONS = [
+    ("anime_offsets", "Q"),
+    ("anime_hashes", "Q"),
+    ("anime_positions", "I"),
+    ("episode_offsets", "Q"),
+    ("episode_numbers", "q"),
+    ("group_hashes", "Q"),
+    ("group_bounds", "I"),
+]
+
+def id_hash(doc_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_id.encode(), digest_size=8).digest(), "little")
+
+def _pad(n: int) -> int:
+    return (n + 7) & ~7
+
+def write_snapshot(path: str, anime: Iterable[dict], episodes: Iterable[dict]) -> dict:
+    """Write response-shaped anime/episode dicts to path atomically; returns the header"""
+    anime_rows = sorted(((title_key(a.get("title")), a["id"], orjson.dumps(a)) for a in anime))
+
+    grouped = {}
+    for ep in episodes:
+        # later duplicates of (anime_id, number) win, like MemoryCatalog.load
+        grouped.setdefault(ep["anime_id"], {})[ep["number"]] = orjson.dumps(ep)
+
+    records: List[bytes] = [row[2] for row in anime_rows]
+    anime_hashes = sorted((id_hash(aid), pos) for pos, (_, aid, _) in enumerate(anime_rows))
+
+    episode_numbers = array("q")
+    groups = []
+    for anime_id, by_number in grouped.items():
+        start = len(episode_numbers)
+        for number in sorted(by_number):
+            episode_numbers.append(number)
+            records.append(by_number[number])
+        groups.append((id_hash(anime_id), start, len(episode_numbers)))
+    groups.sort()
+
+    arrays = {
+        "anime_hashes": array("Q", (h for h, _ in anime_hashes)),
+        "anime_positions": array("I", (p for _, p in anime_hashes)),
+        "episode_numbers": episode_numbers,
+        "group_hashes": array("Q", (h for h, _, _ in groups)),
+        "group_bounds": array("I", (b for _, start, end in groups for b in (start, end))),
+    }
+    anime_count, episode_count = len(anime_rows), len(episode_numbers)
+    # record offsets are placeholders until the data section position is known
+    arrays["anime_offsets"] = array("Q", bytes(8 * (anime_count + 1)))
+    arrays["episode_offsets"] = array("Q", bytes(8 * (episode_count + 1)))
+
+    header = {
+        "version": format(time.time_ns() // 1000, "x"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "anime_count": anime_count,
+        "episode_count": episode_count,
+        "group_count": len(groups),
+        "sections": {},
+    }
+    # The header's own size depends on the section offsets; size it with
+    # generous placeholders first, then pad the real header to that length
+    sizes = {name: arrays[name].itemsize * len(arrays[name]) for name, _ in SECTIONS}
+    header["sections"] = {name: [2**63, 2**63] for name, _ in SECTIONS}
+    header["sections"]["records"] = [2**63, 2**63]
+    header["size"] = 2**63
+    header_len = len(orjson.dumps(header))
+    pos = _pad(_PREAMBLE.size + header_len)
+    for name, _ in SECTIONS:
+        header["sections"][name] = [pos, sizes[name]]
+        pos = _pad(pos + sizes[name])
+    data_start = pos
+
+    offset = data_start
+    for i, record in enumerate(records):
+        if i < anime_count:
+            arrays["anime_offsets"][i] = offset
+        else:
+            arrays["episode_offsets"][i - anime_count] = offset
+        offset += len(record)
+    arrays["anime_offsets"][anime_count] = data_start + sum(len(r) for r in records[:anime_count])
+    arrays["episode_offsets"][episode_count] = offset
+    header["sections"]["records"] = [data_start, offset - data_start]
+    header["size"] = offset
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        raw_header = orjson.dumps(header).ljust(header_len)
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, header_len) + raw_header)
+        for name, _ in SECTIONS:
+            f.seek(header["sections"][name][0])
+            arrays[name].tofile(f)
+        f.seek(data_start)
+        for record in records:
+            f.write(record)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return header
+
+class Snapshot:
+    """One opened snapshot file; the read methods mirror catalog.MemoryCatalog"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, header_len = _PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a format {FORMAT_VERSION} catalog snapshot")
+        self.header = orjson.loads(self._mm[_PREAMBLE.size:_PREAMBLE.size + header_len])
+        if self.header["size"] != len(self._mm):
+            raise ValueError(f"{path} is truncated")
+        self.version = self.header["version"]
+        view = memoryview(self._mm)
+        for name, code in SECTIONS:
+            start, length = self.header["sections"][name]
+            setattr(self, f"_{name}", view[start:start + length].cast(code))
+
+    @property
+    def anime_count(self) -> int:
+        return self.header["anime_count"]
+
+    @property
+    def episode_count(self) -> int:
+        return self.header["episode_count"]
+
+    def _anime_at(self, pos: int) -> dict:
+        return orjson.loads(self._mm[self._anime_offsets[pos]:self._anime_offsets[pos + 1]])
+
+    def _episode_at(self, pos: int) -> dict:
+        return orjson.loads(self._mm[self._episode_offsets[pos]:self._episode_offsets[pos + 1]])
+
+    def _anime_position(self, anime_id: str) -> Optional[Tuple[int, dict]]:
+        h = id_hash(anime_id)
+        i = bisect.bisect_left(self._anime_hashes, h)
+        # walk hash collisions, comparing the stored id
+        while i < len(self._anime_hashes) and self._anime_hashes[i] == h:
+            pos = self._anime_positions[i]
+            doc = self._anime_at(pos)
+            if doc["id"] == anime_id:
+                return pos, doc
+            i += 1
+        return None
+
+    def _episode_bounds(self, anime_id: str) -> Optional[Tuple[int, int]]:
+        h = id_hash(anime_id)
+        i = bisect.bisect_left(self._group_hashes, h)
+        while i < len(self._group_hashes) and self._group_hashes[i] == h:
+            start, end = self._group_bounds[2 * i], self._group_bounds[2 * i + 1]
+            if self._episode_at(start)["anime_id"] == anime_id:
+                return start, end
+            i += 1
+        return None
+
+    def get_anime(self, anime_id: str) -> Optional[dict]:
+        found = self._anime_position(anime_id)
+        return found[1] if found else None
+
+    def all_anime(self) -> Iterator[dict]:
+        """Every anime in title order, decoded lazily"""
+        for pos in range(self.anime_count):
+            yield self._anime_at(pos)
+
+    def all_episodes(self) -> Iterator[dict]:
+        """Every episode, grouped by anime and in number order, decoded lazily"""
+        for pos in range(self.episode_count):
+            yield self._episode_at(pos)
+
+    def _title_position(self, title: Any, anime_id: str) -> int:
+        """Index of the first anime strictly after (title, id) in title order"""
+        found = self._anime_position(anime_id)
+        key = (title_key(title), anime_id)
+        if found and title_key(found[1].get("title")) == key[0]:
+            return found[0] + 1
+        # id not in this snapshot (e.g. a cursor from an older one): binary search on decoded keys
+        lo, hi = 0, self.anime_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            doc = self._anime_at(mid)
+            if (title_key(doc.get("title")), doc["id"]) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def page_anime(
+        self,
+        limit: int,
+        after: Optional[Tuple[Any, str]] = None,
+        match: Optional[Callable[[dict], bool]] = None,
+    ) -> List[dict]:
+        start = self._title_position(*after) if after is not None else 0
+        if match is None:
+            return [self._anime_at(pos) for pos in range(start, min(start + limit, self.anime_count))]
+        items = []
+        for pos in range(start, self.anime_count):
+            doc = self._anime_at(pos)
+            if match(doc):
+                items.append(doc)
+                if len(items) >= limit:
+                    break
+        return items
+
+    def page_episodes(
+        self,
+        anime_id: str,
+        limit: int,
+        after_number: Optional[int] = None,
+        up_to_number: Optional[int] = None,
+    ) -> List[dict]:
+        bounds = self._episode_bounds(anime_id)
+        if bounds is None:
+            return []
+        lo, hi = bounds
+        start = bisect.bisect_right(self._episode_numbers, after_number, lo, hi) if after_number is not None else lo
+        end = bisect.bisect_right(self._episode_numbers, up_to_number, lo, hi) if up_to_number is not None else hi
+        return [self._episode_at(pos) for pos in range(start, min(end, start + limit))]
+
+class SnapshotCatalog:
+    """The current Snapshot of a path, re-opened when the file is replaced.
+
+    A swap is a single reference assignment; requests still holding the old
+    Snapshot keep reading its mapping, which is unmapped once unreferenced.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.current: Optional[Snapshot] = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def _file_id(self):
+        st = os.stat(self.path)
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    def reload_if_changed(self) -> bool:
+        """Open the file if it changed since the last load; True when a new snapshot was swapped in"""
+        with self._lock:
+            file_id = self._file_id()
+            if file_id == self._stat:
+                return False
+            snapshot = Snapshot(self.path)
+            self.current, self._stat = snapshot, file_id
+            return True
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.current.version if self.current else None
+
+    @property
+    def anime_count(self) -> int:
+        return self.current.anime_count
+
+    @property
+    def episode_count(self) -> int:
+        return self.current.episode_count
+
+    def get_anime(self, anime_id: str) -> Optional[dict]:
+        return self.current.get_anime(anime_id)
+
+    def all_anime(self) -> Iterator[dict]:
+        return self.current.all_anime()
+
+    def all_episodes(self) -> Iterator[dict]:
+        return self.current.all_episodes()
+
+    def page_anime(
+        self,
+        limit: int,
+        after: Optional[Tuple[Any, str]] = None,
+        match: Optional[Callable[[dict], bool]] = None,
+    ) -> List[dict]:
+        return self.current.page_anime(limit, after, match)
+
+    def page_episodes(self, anime_id: str, limit: int, after_number: Optional[int] = None, up_to_number: Optional[int] = None) -> List[dict]:
+        return self.current.page_episodes(anime_id, limit, after_number, up_to_number)
+
+def export_snapshot(database, path: str, anime_out: Callable[[dict], dict], episode_out: Callable[[dict], dict]) -> dict:
+    """Export the anime and episode collections of a (sync) database to a snapshot file"""
+    anime = (anime_out(doc) for doc in database["anime"].find({}))
+    episodes = (episode_out(doc) for doc in database["episode"].find({}))
+    return write_snapshot(path, anime, episodes)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from database import db
+        from main import _anime_out, _episode_out
+
+        if db is None:
+            raise SystemExit("DATABASE_URL and DATABASE_NAME must be set")
+        header = export_snapshot(db, args.path, _anime_out, _episode_out)
+    else:
+        header = Snapshot(args.path).header
+    print(orjson.dumps({k: v for k, v in header.items() if k != "sections"}).decode())
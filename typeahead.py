@@ -0,0 +1,209 @@
+"""
+Title Typeahead
+
+Prefix lookup over normalized anime titles (lowercased, accents and
+punctuation stripped, like search.py). A query matches titles that start
+with it first, then titles with a word starting with it: "tit" finds
+"Attack on Titan". Within each group results are in alphabetical order.
+
+Instead of a trie, every match position is one 8-byte entry (title slot,
+character offset) in a sorted array; a prefix is a contiguous range found
+with two binary searches, so a lookup is O(log n + limit) and the index
+costs about 8 bytes per word on top of the normalized titles. Titles
+added after the build go to a small sorted delta list, spliced into the
+arrays (a memcpy-speed rebuild) once it grows past TYPEAHEAD_DELTA_SIZE.
+"""
+
+import bisect
+import heapq
+import os
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from search import tokenize
+
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_DELTA_SIZE = int(os.getenv("TYPEAHEAD_DELTA_SIZE", 4096))
+_OFFSET_BITS = 16
+_OFFSET_MASK = (1 << _OFFSET_BITS) - 1
+# sorts after any character that can follow a prefix
+_HIGH = "\uffff"
+
+def normalize_title(title: Optional[str]) -> str:
+    return " ".join(tokenize(title))
+
+def _word_starts(norm: str) -> Iterator[int]:
+    for offset in range(1, min(len(norm), _OFFSET_MASK + 1)):
+        if norm[offset - 1] == " ":
+            yield offset
+
+class Typeahead:
+    """Sorted prefix index of titles, whole-title matches ranked before word-start matches"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids: List[str] = []
+        self._titles: List[str] = []
+        self._norm: List[str] = []
+        self._slots: Dict[str, int] = {}
+        # slots of renamed titles, skipped by lookups until the next splice,
+        # which removes their entries and frees them for reuse
+        self._stale = set()
+        self._free: List[int] = []
+        # sorted entries (slot << 16 | offset): offset 0 in _heads, word starts in _words
+        self._heads = array("Q")
+        self._words = array("Q")
+        self._delta_heads: List[Tuple[str, int]] = []
+        self._delta_words: List[Tuple[str, int]] = []
+        # titles added while a replacement is built off to the side, replayed by swap()
+        self._rebuilding = False
+        self._added: List[Tuple[str, str]] = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _key(self, entry: int) -> str:
+        return self._norm[entry >> _OFFSET_BITS][entry & _OFFSET_MASK:]
+
+    def _new_slot(self, anime_id: str, title: str) -> Tuple[int, str]:
+        old = self._slots.get(anime_id)
+        if old is not None:
+            self._stale.add(old)
+        norm = normalize_title(title)
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot], self._titles[slot], self._norm[slot] = anime_id, title, norm
+        else:
+            slot = len(self._norm)
+            self._ids.append(anime_id)
+            self._titles.append(title)
+            self._norm.append(norm)
+        self._slots[anime_id] = slot
+        return slot, norm
+
+    def load(self, titles: Iterable[Tuple[str, str]]):
+        """Replace the contents with (id, title) pairs, sorting each array once.
+
+        Large catalogs should be loaded into a new instance off the event
+        loop and swapped in.
+        """
+        with self._lock:
+            self._reset()
+            heads, words = [], []
+            for anime_id, title in titles:
+                slot, norm = self._new_slot(anime_id, title or "")
+                if norm:
+                    heads.append(slot << _OFFSET_BITS)
+                    words.extend(slot << _OFFSET_BITS | offset for offset in _word_starts(norm))
+            self._heads = array("Q", sorted(heads, key=self._key))
+            self._words = array("Q", sorted(words, key=self._key))
+
+    def begin_rebuild(self):
+        """Record titles added from now on, for the swap() of an index about to be built"""
+        with self._lock:
+            self._rebuilding = True
+            self._added = []
+
+    def cancel_rebuild(self):
+        with self._lock:
+            self._rebuilding = False
+            self._added = []
+
+    def swap(self, other: "Typeahead"):
+        """Take over an index built off to the side, replaying titles added since begin_rebuild()"""
+        with self._lock:
+            added = self._added
+            for name in ("_ids", "_titles", "_norm", "_slots", "_stale", "_free", "_heads", "_words", "_delta_heads", "_delta_words"):
+                setattr(self, name, getattr(other, name))
+            self._rebuilding = False
+            self._added = []
+        for anime_id, title in added:
+            self.add(anime_id, title)
+
+    def add(self, anime_id: str, title: Optional[str]):
+        """Index a new or renamed title; an unchanged title is left as is"""
+        with self._lock:
+            if self._rebuilding:
+                self._added.append((anime_id, title))
+            slot = self._slots.get(anime_id)
+            if slot is not None and self._titles[slot] == (title or ""):
+                return
+            slot, norm = self._new_slot(anime_id, title or "")
+            if norm:
+                bisect.insort(self._delta_heads, (norm, slot << _OFFSET_BITS))
+                for offset in _word_starts(norm):
+                    bisect.insort(self._delta_words, (norm[offset:], slot << _OFFSET_BITS | offset))
+            if len(self._delta_heads) + len(self._delta_words) > TYPEAHEAD_DELTA_SIZE:
+                self._heads = self._splice(self._heads, self._delta_heads)
+                self._words = self._splice(self._words, self._delta_words)
+                self._delta_heads, self._delta_words = [], []
+                for slot in self._stale:
+                    self._ids[slot] = self._titles[slot] = self._norm[slot] = ""
+                self._free.extend(self._stale)
+                self._stale = set()
+
+    def _splice(self, entries: array, delta: List[Tuple[str, int]]) -> array:
+        """entries with the delta inserted and stale entries removed, copied in slices"""
+        edits = []
+        for key, entry in delta:
+            if entry >> _OFFSET_BITS not in self._stale:
+                edits.append((bisect.bisect_left(entries, key, key=self._key), 1, key, entry))
+        for slot in self._stale:
+            norm = self._norm[slot]
+            offsets = [0] if entries is self._heads else list(_word_starts(norm))
+            for offset in offsets if norm else []:
+                entry = slot << _OFFSET_BITS | offset
+                pos = bisect.bisect_left(entries, norm[offset:], key=self._key)
+                while pos < len(entries) and entries[pos] != entry and self._key(entries[pos]) == norm[offset:]:
+                    pos += 1
+                if pos < len(entries) and entries[pos] == entry:
+                    edits.append((pos, 0, "", entry))
+        # several inserts at one position go in key order
+        merged, start = array("Q"), 0
+        for pos, insert, _, entry in sorted(edits):
+            merged.extend(entries[start:pos])
+            start = max(start, pos)
+            if insert:
+                merged.append(entry)
+            else:
+                start = pos + 1
+        merged.extend(entries[start:])
+        return merged
+
+    def _range(self, entries: array, delta: List[Tuple[str, int]], prefix: str) -> Iterator[int]:
+        """Entries whose key starts with prefix, in key order (array and delta merged)"""
+        lo = bisect.bisect_left(entries, prefix, key=self._key)
+        hi = bisect.bisect_left(entries, prefix + _HIGH, lo, key=self._key)
+        found = (entries[i] for i in range(lo, hi))
+        if not delta:
+            return found
+        d_lo = bisect.bisect_left(delta, (prefix,))
+        d_hi = bisect.bisect_left(delta, (prefix + _HIGH,), d_lo)
+        return heapq.merge(found, (entry for _, entry in delta[d_lo:d_hi]), key=self._key)
+
+    def complete(self, query: str, limit: int = TYPEAHEAD_LIMIT) -> List[dict]:
+        """Up to limit {"id", "title"} whose title or one of its words starts with query"""
+        prefix = normalize_title(query)
+        if not prefix or limit <= 0:
+            return []
+        # a trailing space ends the last word: "one " matches "One Piece", not "Onegai"
+        if query[-1:].isspace():
+            prefix += " "
+        with self._lock:
+            results, seen = [], set()
+            for entries, delta in ((self._heads, self._delta_heads), (self._words, self._delta_words)):
+                for entry in self._range(entries, delta, prefix):
+                    slot = entry >> _OFFSET_BITS
+                    if slot in seen or slot in self._stale:
+                        continue
+                    seen.add(slot)
+                    results.append({"id": self._ids[slot], "title": self._titles[slot]})
+                    if len(results) >= limit:
+                        return results
+            return results
+
+typeahead = Typeahead()
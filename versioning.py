@@ -0,0 +1,94 @@
+"""
+Catalog Versions and ETags
+
+Monotonic version counters per catalog scope ("anime" for the list views,
+"anime:<id>" for one title, "episodes:<anime_id>" for an episode list).
+Writes bump the scopes they touch; read endpoints derive strong ETags from
+the versions they depend on, so a conditional GET can be answered with
+304 before any database work or serialization happens.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from compression import negotiate, variant_etag
+from shared import SharedCounters, shared_counters
+
+# Tune with CATALOG_MAX_AGE; 0 means clients and CDNs must revalidate every time
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 0))
+CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}, must-revalidate"
+
+class CatalogVersions:
+    """Per-scope version counters; the epoch keeps ETags unique across restarts.
+
+    With shared counters (multi-worker mode) the versions and the epoch are
+    the same in every worker, so are the ETags.
+    """
+
+    def __init__(self, counters: Optional[SharedCounters] = None):
+        self._counters = counters
+        self.epoch = counters.epoch if counters is not None else format(time.time_ns() // 1000, "x")
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, scope: str) -> int:
+        if self._counters is not None:
+            return self._counters.get(scope)
+        return self._versions.get(scope, 0)
+
+    def bump(self, *scopes: str):
+        if self._counters is not None:
+            self._counters.bump(*scopes)
+            return
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] += 1
+
+    def etag(self, *scopes: str, params: str = "") -> str:
+        """Strong ETag for a response built from the given scopes and request params"""
+        versions = ".".join(str(self.get(scope)) for scope in scopes)
+        digest = hashlib.blake2b(params.encode(), digest_size=6).hexdigest() if params else "0"
+        return f'"{self.epoch}-{versions}-{digest}"'
+
+catalog_versions = CatalogVersions(shared_counters)
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix; compressed
+    # variants (compression.py) carry the same tag plus a "-<coding>" suffix
+    variant_prefix = etag[:-1] + "-"
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == etag or tag.startswith(variant_prefix):
+            return True
+    return False
+
+def conditional_get(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set caching headers; returns a 304 response when the client copy is current"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers={**headers, **_not_modified_headers(request, if_none_match, etag)})
+    response.headers.update(headers)
+    return None
+
+def _not_modified_headers(request: Request, if_none_match: str, etag: str) -> Dict[str, str]:
+    """ETag and Vary of the representation the client holds, as compression.encoded_response sent them"""
+    sent = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    variant = variant_etag(etag, negotiate(request.headers.get("accept-encoding")))
+    if variant in sent or "*" in sent:
+        current = variant
+    elif etag in sent:
+        # bodies under COMPRESS_MIN_SIZE go out uncompressed with the plain ETag
+        current = etag
+    else:
+        # a variant in another coding than the one negotiated now
+        current = next(tag for tag in sent if tag.startswith(etag[:-1] + "-"))
+    return {"ETag": current, "Vary": "Accept-Encoding"}